@@ -0,0 +1,293 @@
+"""
+自动删种（AutoDeleteTorrent）离线性能测试
+
+使用模拟的QB/TR种子数据测试转换精简记录、删种条件检查、辅种比对、空间规划、通知组装各阶段的耗时和内存峰值，无需连接下载器：
+    python benchmarks/autodeletetorrent_benchmark.py
+    python benchmarks/autodeletetorrent_benchmark.py --scales 1000 10000 --downloaders qbittorrent
+"""
+import argparse
+import copy
+import importlib
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+PLUGIN_PATH = Path(__file__).resolve().parent.parent / "plugins.v2" / "autodeletetorrent"
+
+
+def load_plugin_modules() -> types.SimpleNamespace:
+    """
+    加载插件中不依赖MoviePilot的模块，不执行插件的__init__.py
+    """
+    package = types.ModuleType("autodeletetorrent")
+    package.__path__ = [str(PLUGIN_PATH)]
+    sys.modules["autodeletetorrent"] = package
+    return types.SimpleNamespace(
+        records=importlib.import_module("autodeletetorrent.records"),
+        rules=importlib.import_module("autodeletetorrent.rules"),
+        planner=importlib.import_module("autodeletetorrent.planner"),
+        inodes=importlib.import_module("autodeletetorrent.inodes"),
+        samedata=importlib.import_module("autodeletetorrent.samedata"),
+        report=importlib.import_module("autodeletetorrent.report"),
+        vectorize=importlib.import_module("autodeletetorrent.vectorize")
+    )
+
+
+modules = load_plugin_modules()
+
+GB = modules.rules.GB
+
+# 模拟的删种条件
+BENCH_CONFIG = {
+    "size": "1-50",
+    "ratio": "1",
+    "time": "72",
+    "upspeed": "100",
+    "pathkeywords": r"/(movie|tv|anime)s?/",
+    "trackerkeywords": r"(tracker|announce)\.site(1|2|3|4|5|6|7|8)\.",
+    "errorkeywords": "",
+    "torrentstates": "pausedUP, stalledUP, uploading, queuedUP",
+    "torrentcategorys": "movie, tv, anime"
+}
+
+STATES = ["pausedUP", "stalledUP", "uploading", "queuedUP", "downloading", "stalledDL", "error"]
+CATEGORIES = ["movie", "tv", "anime", "music", ""]
+SAVE_PATHS = ["/downloads/movies/", "/downloads/tv/", "/downloads/anime/", "/downloads/music/", "/data/other/"]
+
+
+def make_trackers(count: int) -> List[Tuple[str, str]]:
+    """
+    模拟的Tracker地址和站点名
+    """
+    prefixes = ["tracker", "announce", "t", "pt"]
+    return [(f"https://{prefixes[i % len(prefixes)]}.site{i}.org/announce.php?passkey={i:032x}", f"site{i}")
+            for i in range(count)]
+
+
+def make_groups(count: int, rnd: random.Random, samedata_ratio: float) -> List[Tuple[str, int]]:
+    """
+    生成每个种子的名称和大小，按比例组成2-4个种子的辅种组
+    """
+    groups = []
+    while len(groups) < count:
+        name = f"Show.{rnd.randint(1, 10 ** 9)}.S01.2160p.WEB-DL.H265-GRP"
+        size = rnd.randint(GB // 2, 60 * GB)
+        members = rnd.randint(2, 4) if rnd.random() < samedata_ratio else 1
+        groups.extend([(name, size)] * members)
+    rnd.shuffle(groups)
+    return groups[:count]
+
+
+def make_qb_torrents(count: int, seed: int = 1, samedata_ratio: float = 0.3, trackers: int = 40) -> List[Any]:
+    """
+    生成QB种子
+    """
+    rnd = random.Random(seed)
+    tracker_list = make_trackers(trackers)
+    now = int(time.time())
+    torrents = []
+    for index, (name, size) in enumerate(make_groups(count, rnd, samedata_ratio)):
+        added_on = now - rnd.randint(3600, 200 * 24 * 3600)
+        torrents.append(types.SimpleNamespace(
+            hash=f"{index:040x}",
+            name=name,
+            size=size,
+            ratio=rnd.random() * 5,
+            uploaded=int(size * rnd.random() * 5),
+            added_on=added_on,
+            completion_on=added_on + rnd.randint(60, 7200) if rnd.random() < 0.9 else 0,
+            save_path=rnd.choice(SAVE_PATHS),
+            tracker=rnd.choice(tracker_list)[0],
+            state=rnd.choice(STATES),
+            category=rnd.choice(CATEGORIES),
+            tags="MOVIEPILOT" if rnd.random() < 0.7 else ""
+        ))
+    return torrents
+
+
+def make_tr_torrents(count: int, seed: int = 1, samedata_ratio: float = 0.3, trackers: int = 40) -> List[Any]:
+    """
+    生成TR种子，每个种子带有多个Tracker
+    """
+    rnd = random.Random(seed)
+    tracker_list = make_trackers(trackers)
+    now = int(time.time())
+    torrents = []
+    for index, (name, size) in enumerate(make_groups(count, rnd, samedata_ratio)):
+        added = now - rnd.randint(3600, 200 * 24 * 3600)
+        torrents.append(types.SimpleNamespace(
+            id=index,
+            hashString=f"{index:040x}",
+            name=name,
+            total_size=size,
+            ratio=rnd.random() * 5,
+            date_added=datetime.fromtimestamp(added),
+            date_done=datetime.fromtimestamp(added + rnd.randint(60, 7200)) if rnd.random() < 0.9 else None,
+            download_dir=rnd.choice(SAVE_PATHS),
+            trackers=[{"announce": announce, "sitename": sitename}
+                      for announce, sitename in rnd.sample(tracker_list, rnd.randint(1, 3))],
+            error_string="Unregistered torrent" if rnd.random() < 0.05 else "",
+            labels=["MOVIEPILOT"] if rnd.random() < 0.7 else []
+        ))
+    return torrents
+
+
+def to_item(torrent: Any) -> dict:
+    """
+    与插件一致的待处理种子信息
+    """
+    return {"id": torrent.hash, "name": torrent.name,
+            "site": torrent.site if torrent.site is not None else torrent.trackers[0], "size": torrent.size}
+
+
+def format_size(size: int) -> str:
+    """
+    文件大小格式化
+    """
+    return f"{size / GB:.2f}G"
+
+
+def measure(func: Callable[[], Any]) -> Tuple[Any, float, int]:
+    """
+    分别测量耗时和内存峰值，返回结果、耗时（秒）、内存峰值（字节）
+    """
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run_scale(downloader_type: str, count: int) -> List[Dict[str, Any]]:
+    """
+    测试单个规模下的各阶段
+    """
+    if downloader_type == "qbittorrent":
+        raw_torrents = make_qb_torrents(count)
+        convert = modules.records.from_qb
+    else:
+        raw_torrents = make_tr_torrents(count)
+        convert = modules.records.from_tr
+    rules = modules.rules.TorrentRules.from_config(BENCH_CONFIG)
+    match = rules.match
+    now = int(time.time())
+    rows = []
+
+    def normalize() -> List[Any]:
+        return [convert(torrent) for torrent in raw_torrents]
+
+    torrents, elapsed, peak = measure(normalize)
+    rows.append({"phase": "normalize", "time": elapsed, "peak": peak})
+    # 释放原始对象，后续阶段只使用精简记录
+    raw_torrents = None
+
+    def filter_scalar() -> List[dict]:
+        return [to_item(torrent) for torrent in torrents if match(torrent, now)]
+
+    _, elapsed, peak = measure(filter_scalar)
+    # 首次检查时正则检查缓存的命中率，measure会运行两次，使用新的条件实例单独检查一遍
+    cold_rules = modules.rules.TorrentRules.from_config(BENCH_CONFIG)
+    for torrent in torrents:
+        cold_rules.match(torrent, now)
+    memo_note = " ".join(f"{name}缓存命中{hits / (hits + misses):.1%}"
+                         for name, (hits, misses) in cold_rules.memo_stats().items() if hits + misses)
+    rows.append({"phase": "filter", "time": elapsed, "peak": peak, "note": memo_note})
+
+    if modules.vectorize.is_available():
+        def filter_vectorized() -> List[bool]:
+            return modules.vectorize.match_torrents(rules=rules, torrents=torrents, now=now)
+
+        matches, elapsed, peak = measure(filter_vectorized)
+        rows.append({"phase": "filter(numpy)", "time": elapsed, "peak": peak})
+        # 向量化检查结果需与逐个检查一致
+        scalar_matches = [match(torrent, now) for torrent in torrents]
+        if matches != scalar_matches:
+            raise AssertionError(f"{downloader_type} {count} 向量化检查结果与逐个检查不一致")
+
+    verdicts = {}
+    remove_torrents = []
+    for torrent in torrents:
+        item = to_item(torrent) if match(torrent, now) else None
+        verdicts[torrent.hash] = item
+        if item:
+            remove_torrents.append(item)
+
+    def resolve() -> Tuple[List[dict], List[Any], List[dict]]:
+        return modules.samedata.resolve_samedata(torrents=torrents, remove_torrents=remove_torrents,
+                                                 verdicts=verdicts)
+
+    (results, plus_torrents, skipped), elapsed, peak = measure(resolve)
+    rows.append({"phase": "samedata", "time": elapsed, "peak": peak,
+                 "note": f"候选{len(remove_torrents)} 保留{len(results)} 跳过{len(skipped)}"})
+
+    # 在临时目录中为候选种子生成4KB的数据文件，每三个种子有一个硬链接到媒体库，
+    # 下载目录按两个一组模拟在同一磁盘，每个磁盘的空间缺口为候选种子数据的一半
+    with tempfile.TemporaryDirectory() as data_root:
+        rebased = {path: os.path.join(data_root, path.strip("/")) for path in SAVE_PATHS}
+        plan_torrents = []
+        for torrent in torrents:
+            torrent = copy.copy(torrent)
+            torrent.save_path = rebased[torrent.save_path]
+            plan_torrents.append(torrent)
+        plan_records = {torrent.hash: torrent for torrent in plan_torrents}
+        candidates = [plan_records[item["id"]] for item in results] \
+            + [plan_records[torrent.hash] for torrent in plus_torrents]
+        library = os.path.join(data_root, "library")
+        os.makedirs(library)
+        for number, torrent in enumerate({torrent.data_path: torrent for torrent in candidates}.values()):
+            os.makedirs(torrent.save_path, exist_ok=True)
+            with open(torrent.data_path, "wb") as f:
+                f.write(b"0" * 4096)
+            if number % 3 == 0:
+                os.link(torrent.data_path, os.path.join(library, f"{number}"))
+        path_disks = {rebased[path]: index // 2 for index, path in enumerate(SAVE_PATHS)}
+        deficits = {}
+        for torrent in candidates:
+            deficits[path_disks[torrent.save_path]] = deficits.get(path_disks[torrent.save_path], 0) + 2048
+
+        def plan() -> List[Any]:
+            units = modules.planner.build_units(torrents=plan_torrents, candidates=candidates,
+                                                path_disks=path_disks, index=modules.inodes.InodeIndex(), now=now)
+            return modules.planner.plan_reclaim(units=units, deficits=deficits)[0]
+
+        selected, elapsed, peak = measure(plan)
+    rows.append({"phase": "plan", "time": elapsed, "peak": peak,
+                 "note": f"候选{len(candidates)} 删除{sum(len(unit.hashes) for unit in selected)}"})
+
+    def build() -> List[str]:
+        text_items = [modules.report.torrent_text(torrent, format_size=format_size) for torrent in results]
+        return modules.report.paginate(f"{downloader_type} 共删除{len(results)}个种子", text_items)
+
+    pages, elapsed, peak = measure(build)
+    rows.append({"phase": "message", "time": elapsed, "peak": peak,
+                 "note": f"{len(pages)}页 {sum(len(page) for page in pages)}字符"})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="自动删种离线性能测试")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="种子数量")
+    parser.add_argument("--downloaders", nargs="+", default=["qbittorrent", "transmission"],
+                        choices=["qbittorrent", "transmission"], help="下载器类型")
+    args = parser.parse_args()
+    print(f"{'downloader':<14}{'torrents':>10}  {'phase':<15}{'time(ms)':>12}{'peak(KB)':>12}  note")
+    for downloader_type in args.downloaders:
+        for count in args.scales:
+            for row in run_scale(downloader_type, count):
+                print(f"{downloader_type:<14}{count:>10}  {row['phase']:<15}"
+                      f"{row['time'] * 1000:>12.1f}{row['peak'] / 1024:>12.1f}  {row.get('note', '')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
-import re
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 from typing import List, Tuple, Dict, Any, Optional
 
@@ -14,8 +14,20 @@ from app.log import logger
 from app.plugins import _PluginBase
 from app.schemas import NotificationType, ServiceInfo
 from app.utils.string import StringUtils
+from .rules import TorrentRules
+from .sync import TorrentStateCache, TR_FIELDS, filter_tags, qb_status_filter
+from .memo import LruCache
+from .metrics import CACHES, COUNTERS, PHASES, MetricsRecorder, RunMetrics
+from .report import paginate, torrent_text
+from .records import TorrentRecord, from_qb, from_tr
+from .inodes import InodeIndex
+from .planner import build_units, plan_reclaim, read_disks
+from .samedata import resolve_samedata
+from . import vectorize
 
 lock = threading.Lock()
+# 各下载器的运行锁
+downloader_locks: Dict[str, threading.Lock] = {}
 
 
 class AutoDeleteTorrent(_PluginBase):
@@ -26,7 +38,7 @@ class AutoDeleteTorrent(_PluginBase):
     # 插件图标
     plugin_icon = "delete.jpg"
     # 插件版本
-    plugin_version = "2.1"
+    plugin_version = "3.7"
     # 插件作者
     plugin_author = "dongjiqiang"
     # 作者主页
@@ -61,6 +73,37 @@ class AutoDeleteTorrent(_PluginBase):
     _errorkeywords = None
     _torrentstates = None
     _torrentcategorys = None
+    # 每批处理的种子数
+    _batchsize = 100
+    # 并发处理的下载器数
+    _max_workers = 4
+    # 单个下载器处理超时时间（秒）
+    _downloader_timeout = 1800
+    # 预编译的删种条件
+    _rules: Optional[TorrentRules] = None
+    # 下载器服务缓存及有效期（秒）
+    _service_infos: Optional[Dict[str, ServiceInfo]] = None
+    _service_infos_time = 0
+    _service_ttl = 300
+    # 增量同步种子状态
+    _incremental = False
+    _state_caches: Dict[str, TorrentStateCache] = {}
+    # 向量化检查
+    _vectorize = False
+    # 最近运行统计
+    _metrics = MetricsRecorder()
+    # 通知方式 each/aggregate
+    _notify_mode = "each"
+    # 单条通知最大字符数
+    _message_size = 2000
+    # 目标可用空间（GB），为空时删除所有符合条件的种子
+    _free_space = ""
+    # 删除文件时跳过不释放空间的种子
+    _skip_unfreed = False
+    # 通知最大分页数
+    _message_pages = 5
+    # Tracker地址 -> 站点名称，与删种条件无关，配置变更时保留
+    _site_memo = LruCache(StringUtils.get_url_sld)
 
     def init_plugin(self, config: dict = None):
         self.downloader_helper = DownloaderHelper()
@@ -83,8 +126,33 @@ class AutoDeleteTorrent(_PluginBase):
             self._errorkeywords = config.get("errorkeywords") or ""
             self._torrentstates = config.get("torrentstates") or ""
             self._torrentcategorys = config.get("torrentcategorys") or ""
+            self._batchsize = config.get("batchsize") or 100
+            self._incremental = config.get("incremental")
+            self._vectorize = config.get("vectorize")
+            self._notify_mode = config.get("notify_mode") or "each"
+            self._message_size = config.get("message_size") or 2000
+            self._free_space = config.get("free_space") or ""
+            self._skip_unfreed = config.get("skip_unfreed")
 
         self.stop_service()
+        # 配置变更后重新解析下载器服务，并清空种子状态缓存
+        self.__clear_service_infos()
+        self._state_caches = {}
+
+        # 编译删种条件，配置不合法时停用插件；条件未变化时沿用原实例，保留正则检查缓存
+        try:
+            rules = TorrentRules.from_config(config)
+            if rules != self._rules:
+                self._rules = rules
+        except ValueError as e:
+            logger.error(f"自动删种配置错误：{str(e)}")
+            self._rules = None
+            self._enabled = False
+            self._onlyonce = False
+            self.__update_config()
+            return
+        if self._free_space and self._action != "deletefile":
+            logger.warn(f"自动删种 目标可用空间仅在删除种子和文件时生效")
 
         if self.get_state() or self._onlyonce:
             if self._onlyonce:
@@ -97,32 +165,44 @@ class AutoDeleteTorrent(_PluginBase):
                 # 关闭一次性开关
                 self._onlyonce = False
                 # 保存设置
-                self.update_config({
-                    "enabled": self._enabled,
-                    "notify": self._notify,
-                    "onlyonce": self._onlyonce,
-                    "action": self._action,
-                    "cron": self._cron,
-                    "downloaders": self._downloaders,
-                    "samedata": self._samedata,
-                    "mponly": self._mponly,
-                    "size": self._size,
-                    "ratio": self._ratio,
-                    "time": self._time,
-                    "upspeed": self._upspeed,
-                    "labels": self._labels,
-                    "pathkeywords": self._pathkeywords,
-                    "trackerkeywords": self._trackerkeywords,
-                    "errorkeywords": self._errorkeywords,
-                    "torrentstates": self._torrentstates,
-                    "torrentcategorys": self._torrentcategorys
-
-                })
+                self.__update_config()
                 if self._scheduler.get_jobs():
                     # 启动服务
                     self._scheduler.print_jobs()
                     self._scheduler.start()
 
+    def __update_config(self):
+        """
+        更新配置
+        """
+        self.update_config({
+            "enabled": self._enabled,
+            "notify": self._notify,
+            "onlyonce": self._onlyonce,
+            "action": self._action,
+            "cron": self._cron,
+            "downloaders": self._downloaders,
+            "samedata": self._samedata,
+            "mponly": self._mponly,
+            "size": self._size,
+            "ratio": self._ratio,
+            "time": self._time,
+            "upspeed": self._upspeed,
+            "labels": self._labels,
+            "pathkeywords": self._pathkeywords,
+            "trackerkeywords": self._trackerkeywords,
+            "errorkeywords": self._errorkeywords,
+            "torrentstates": self._torrentstates,
+            "torrentcategorys": self._torrentcategorys,
+            "batchsize": self._batchsize,
+            "incremental": self._incremental,
+            "vectorize": self._vectorize,
+            "notify_mode": self._notify_mode,
+            "message_size": self._message_size,
+            "free_space": self._free_space,
+            "skip_unfreed": self._skip_unfreed
+        })
+
     def get_state(self) -> bool:
         return True if self._enabled and self._cron and self._downloaders else False
 
@@ -131,7 +211,23 @@ class AutoDeleteTorrent(_PluginBase):
         pass
 
     def get_api(self) -> List[Dict[str, Any]]:
-        pass
+        """
+        注册插件API
+        """
+        return [{
+            "path": "/metrics",
+            "endpoint": self.get_metrics,
+            "methods": ["GET"],
+            "auth": "bear",
+            "summary": "运行统计",
+            "description": "最近运行各下载器的阶段耗时和种子数量统计",
+        }]
+
+    def get_metrics(self) -> List[Dict[str, Any]]:
+        """
+        最近运行统计
+        """
+        return self._metrics.recent()
 
     def get_service(self) -> List[Dict[str, Any]]:
         """
@@ -426,6 +522,62 @@ class AutoDeleteTorrent(_PluginBase):
                                         }
                                     }
                                 ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 6
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'batchsize',
+                                            'label': '每批处理种子数',
+                                            'placeholder': '100'
+                                        }
+                                    }
+                                ]
+                            }
+                        ]
+                    },
+                    {
+                        'component': 'VRow',
+                        'content': [
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 6
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSelect',
+                                        'props': {
+                                            'model': 'notify_mode',
+                                            'label': '通知方式',
+                                            'items': [
+                                                {'title': '每个下载器单独通知', 'value': 'each'},
+                                                {'title': '所有下载器汇总通知', 'value': 'aggregate'}
+                                            ]
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 6
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'message_size',
+                                            'label': '单条通知最大字符数',
+                                            'placeholder': '2000，超出时分页发送'
+                                        }
+                                    }
+                                ]
                             }
                         ]
                     },
@@ -436,7 +588,46 @@ class AutoDeleteTorrent(_PluginBase):
                                 'component': 'VCol',
                                 'props': {
                                     'cols': 12,
-                                    'md': 4
+                                    'md': 9
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'free_space',
+                                            'label': '目标可用空间（GB）',
+                                            'placeholder': '仅删除种子和文件时生效，为空时删除所有符合条件的种子，'
+                                                           '否则按价值从低到高删除，直到各下载目录可用空间达到目标'
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 3
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSwitch',
+                                        'props': {
+                                            'model': 'skip_unfreed',
+                                            'label': '跳过不释放空间的种子',
+                                        }
+                                    }
+                                ]
+                            }
+                        ]
+                    },
+                    {
+                        'component': 'VRow',
+                        'content': [
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 3
                                 },
                                 'content': [
                                     {
@@ -452,7 +643,7 @@ class AutoDeleteTorrent(_PluginBase):
                                 'component': 'VCol',
                                 'props': {
                                     'cols': 12,
-                                    'md': 4
+                                    'md': 3
                                 },
                                 'content': [
                                     {
@@ -468,7 +659,39 @@ class AutoDeleteTorrent(_PluginBase):
                                 'component': 'VCol',
                                 'props': {
                                     'cols': 12,
-                                    'md': 4
+                                    'md': 3
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSwitch',
+                                        'props': {
+                                            'model': 'incremental',
+                                            'label': '增量同步（TR仅复用检查结果）',
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 3
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSwitch',
+                                        'props': {
+                                            'model': 'vectorize',
+                                            'label': '向量化检查（需numpy）',
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 3
                                 },
                                 'content': [
                                     {
@@ -563,11 +786,91 @@ class AutoDeleteTorrent(_PluginBase):
             "trackerkeywords": "",
             "errorkeywords": "",
             "torrentstates": "",
-            "torrentcategorys": ""
+            "torrentcategorys": "",
+            "batchsize": 100,
+            "incremental": False,
+            "vectorize": False,
+            "notify_mode": "each",
+            "message_size": 2000,
+            "free_space": "",
+            "skip_unfreed": False
         }
 
     def get_page(self) -> List[dict]:
-        pass
+        """
+        拼装插件详情页面，展示最近运行的阶段耗时、数量统计和缓存命中率
+        """
+        runs = self._metrics.recent()
+        if not runs:
+            return [
+                {
+                    'component': 'div',
+                    'text': '暂无数据',
+                    'props': {
+                        'class': 'text-center',
+                    }
+                }
+            ]
+        headers = ['时间', '下载器', '状态', '总耗时'] \
+            + list(PHASES.values()) + list(COUNTERS.values()) + list(CACHES.values())
+        rows = []
+        for run in runs:
+            values = [run.get("start_time"), run.get("downloader"), run.get("status"), f"{run.get('elapsed')}s"] \
+                + [f"{run['phases'][phase]}s" if phase in run.get("phases") else "-" for phase in PHASES] \
+                + [run['counters'].get(counter, 0) for counter in COUNTERS] \
+                + [f"{run['cache_hit_rates'][cache]:.1%}" if cache in run.get("cache_hit_rates", {}) else "-"
+                   for cache in CACHES]
+            rows.append({
+                'component': 'tr',
+                'content': [
+                    {
+                        'component': 'td',
+                        'props': {
+                            'class': 'whitespace-nowrap'
+                        },
+                        'text': value
+                    } for value in values
+                ]
+            })
+        return [
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {
+                            'cols': 12,
+                        },
+                        'content': [
+                            {
+                                'component': 'VTable',
+                                'props': {
+                                    'hover': True
+                                },
+                                'content': [
+                                    {
+                                        'component': 'thead',
+                                        'content': [
+                                            {
+                                                'component': 'th',
+                                                'props': {
+                                                    'class': 'text-start ps-4'
+                                                },
+                                                'text': header
+                                            } for header in headers
+                                        ]
+                                    },
+                                    {
+                                        'component': 'tbody',
+                                        'content': rows
+                                    }
+                                ]
+                            }
+                        ]
+                    }
+                ]
+            }
+        ]
 
     def stop_service(self):
         """
@@ -587,7 +890,18 @@ class AutoDeleteTorrent(_PluginBase):
     @property
     def service_infos(self) -> Optional[Dict[str, ServiceInfo]]:
         """
-        服务信息
+        服务信息，在有效期内复用已解析的下载器服务
+        """
+        with lock:
+            if self._service_infos and time.monotonic() - self._service_infos_time < self._service_ttl:
+                return self._service_infos
+            self._service_infos = self.__resolve_service_infos()
+            self._service_infos_time = time.monotonic()
+            return self._service_infos
+
+    def __resolve_service_infos(self) -> Optional[Dict[str, ServiceInfo]]:
+        """
+        解析已连接的下载器服务
         """
         if not self._downloaders:
             logger.warning("尚未配置下载器，请检查配置")
@@ -611,180 +925,254 @@ class AutoDeleteTorrent(_PluginBase):
 
         return active_services
 
-    def __get_downloader(self, name: str):
+    def __clear_service_infos(self):
         """
-        根据类型返回下载器实例
+        清除下载器服务缓存
         """
-        return self.service_infos.get(name).instance
+        with lock:
+            self._service_infos = None
+            self._service_infos_time = 0
 
-    def __get_downloader_config(self, name: str):
+    def __get_service(self, name: str) -> Optional[ServiceInfo]:
         """
-        根据类型返回下载器实例配置
+        根据名称返回下载器服务
         """
-        return self.service_infos.get(name).config
+        service_infos = self.service_infos
+        return service_infos.get(name) if service_infos else None
 
     def delete_torrents(self):
         """
-        定时删除下载器中的下载任务
+        定时删除下载器中的下载任务，各下载器并发处理
         """
-        for downloader in self._downloaders:
-            try:
-                with lock:
-                    # 获取需删除种子列表
-                    torrents = self.get_remove_torrents(downloader)
-                    logger.info(f"自动删种任务 获取符合处理条件种子数 {len(torrents)}")
-                    # 下载器
-                    downlader_obj = self.__get_downloader(downloader)
-                    if self._action == "pause":
-                        message_text = f"{downloader.title()} 共暂停{len(torrents)}个种子"
-                        for torrent in torrents:
-                            if self._event.is_set():
-                                logger.info(f"自动删种服务停止")
-                                return
-                            text_item = f"{torrent.get('name')} " \
-                                        f"来自站点：{torrent.get('site')} " \
-                                        f"大小：{StringUtils.str_filesize(torrent.get('size'))}"
-                            # 暂停种子
-                            downlader_obj.stop_torrents(ids=[torrent.get("id")])
-                            logger.info(f"自动删种任务 暂停种子：{text_item}")
-                            message_text = f"{message_text}\n{text_item}"
-                    elif self._action == "delete":
-                        message_text = f"{downloader.title()} 共删除{len(torrents)}个种子"
-                        for torrent in torrents:
-                            if self._event.is_set():
-                                logger.info(f"自动删种服务停止")
-                                return
-                            text_item = f"{torrent.get('name')} " \
-                                        f"来自站点：{torrent.get('site')} " \
-                                        f"大小：{StringUtils.str_filesize(torrent.get('size'))}"
-                            # 删除种子
-                            downlader_obj.delete_torrents(delete_file=False,
-                                                          ids=[torrent.get("id")])
-                            logger.info(f"自动删种任务 删除种子：{text_item}")
-                            message_text = f"{message_text}\n{text_item}"
-                    elif self._action == "deletefile":
-                        message_text = f"{downloader.title()} 共删除{len(torrents)}个种子及文件"
-                        for torrent in torrents:
-                            if self._event.is_set():
-                                logger.info(f"自动删种服务停止")
-                                return
-                            text_item = f"{torrent.get('name')} " \
-                                        f"大小：{StringUtils.str_filesize(torrent.get('size'))}"
-                            # 删除种子
-                            downlader_obj.delete_torrents(delete_file=True,
-                                                          ids=[torrent.get("id")])
-                            logger.info(f"自动删种任务 删除种子及文件：{text_item}")
-                            message_text = f"{message_text}\n{text_item}"
-                    else:
-                        continue
-                    if torrents and message_text and self._notify:
-                        self.post_message(
-                            mtype=NotificationType.SiteMessage,
-                            title=f"【自动删种任务完成】",
-                            text=message_text
-                        )
-            except Exception as e:
-                logger.error(f"自动删种任务异常：{str(e)}")
-
-    def __get_qb_torrent(self, torrent: Any) -> Optional[dict]:
-        """
-        检查QB下载任务是否符合条件
-        """
-        # 完成时间
-        date_done = torrent.completion_on if torrent.completion_on > 0 else torrent.added_on
-        # 现在时间
-        date_now = int(time.mktime(datetime.now().timetuple()))
-        # 做种时间
-        torrent_seeding_time = date_now - date_done if date_done else 0
-        # 平均上传速度
-        torrent_upload_avs = torrent.uploaded / torrent_seeding_time if torrent_seeding_time else 0
-        # 大小 单位：GB
-        sizes = self._size.split('-') if self._size else []
-        minsize = float(sizes[0]) * 1024 * 1024 * 1024 if sizes else 0
-        maxsize = float(sizes[-1]) * 1024 * 1024 * 1024 if sizes else 0
-        # 分享率
-        if self._ratio and torrent.ratio <= float(self._ratio):
-            return None
-        # 做种时间 单位：小时
-        if self._time and torrent_seeding_time <= float(self._time) * 3600:
-            return None
-        # 文件大小
-        if self._size and (torrent.size >= int(maxsize) or torrent.size <= int(minsize)):
-            return None
-        if self._upspeed and torrent_upload_avs >= float(self._upspeed) * 1024:
+        # 每次运行只解析一次下载器服务，获取种子和执行动作复用同一连接
+        service_infos = self.service_infos
+        if not service_infos:
+            return
+        services = {downloader: service_infos.get(downloader) for downloader in self._downloaders
+                    if service_infos.get(downloader)}
+        if not services:
+            return
+        executor = ThreadPoolExecutor(max_workers=min(len(services), self._max_workers),
+                                      thread_name_prefix="AutoDeleteTorrent")
+        aggregate = self._notify_mode == "aggregate"
+        # 每个下载器的超时时间，排队等待的时间也计入
+        deadline = time.monotonic() + self._downloader_timeout
+        futures = {executor.submit(self.__process_downloader, downloader, service, not aggregate, deadline): downloader
+                   for downloader, service in services.items()}
+        not_done = set()
+        for future, downloader in futures.items():
+            # 按各自的超时时间等待，获取种子卡住的下载器不阻塞其它下载器的汇总通知
+            if wait([future], timeout=max(deadline - time.monotonic(), 0) + 5).not_done:
+                logger.warn(f"自动删种任务 {downloader} 处理超时，超时后不再执行动作")
+                not_done.add(future)
+        executor.shutdown(wait=False)
+        # 所有下载器汇总发送一条通知
+        if aggregate:
+            reports = [future.result() for future in futures
+                       if future not in not_done and future.result()]
+            if reports:
+                self.__send_report(title="\n".join(title for title, _ in reports),
+                                   text_items=[item for _, items in reports for item in items])
+
+    def __send_report(self, title: str, text_items: List[str]):
+        """
+        发送删种通知，内容过长时分页发送
+        """
+        if not self._notify:
+            return
+        try:
+            message_size = int(self._message_size)
+        except (TypeError, ValueError):
+            message_size = 2000
+        for page in paginate(title=title, text_items=text_items,
+                             max_length=message_size, max_pages=self._message_pages):
+            self.post_message(
+                mtype=NotificationType.SiteMessage,
+                title=f"【自动删种任务完成】",
+                text=page
+            )
+
+    @staticmethod
+    def __get_downloader_lock(downloader: str) -> threading.Lock:
+        """
+        获取下载器的运行锁
+        """
+        with lock:
+            if downloader not in downloader_locks:
+                downloader_locks[downloader] = threading.Lock()
+            return downloader_locks[downloader]
+
+    def __process_downloader(self, downloader: str, service: ServiceInfo,
+                             notify: bool = True, deadline: float = None) -> Optional[Tuple[str, List[str]]]:
+        """
+        处理单个下载器：获取种子、筛选、暂停/删除、通知
+        :param notify: 是否单独发送通知，否则返回通知标题和内容由调用方汇总发送
+        :param deadline: 超时时间（time.monotonic），获取和筛选种子超时时放弃本次运行，执行动作超时时剩余种子下次处理
+        """
+        downloader_lock = self.__get_downloader_lock(downloader)
+        # 上次任务仍在运行时跳过本次
+        if not downloader_lock.acquire(blocking=False):
+            logger.warn(f"自动删种任务 {downloader} 上次任务仍在运行，本次跳过")
+            self._metrics.start(downloader).finish("跳过")
             return None
-        if self._pathkeywords and not re.findall(self._pathkeywords, torrent.save_path, re.I):
+        metrics = self._metrics.start(downloader)
+        try:
+            # 超时时间
+            deadline = deadline or time.monotonic() + self._downloader_timeout
+            # 获取需删除种子列表
+            torrents = self.get_remove_torrents(downloader, service=service, metrics=metrics, deadline=deadline)
+            logger.info(f"自动删种任务 {downloader} 获取符合处理条件种子数 {len(torrents)}")
+            # 下载器
+            downlader_obj = service.instance
+            if self._action == "pause":
+                action_text, unit_text = "暂停", "个种子"
+                log_title = "暂停种子"
+            elif self._action == "delete":
+                action_text, unit_text = "删除", "个种子"
+                log_title = "删除种子"
+            elif self._action == "deletefile":
+                action_text, unit_text = "删除", "个种子及文件"
+                log_title = "删除种子及文件"
+            else:
+                metrics.finish("完成")
+                return None
+            # 分批执行
+            with metrics.phase("action"):
+                done_torrents, failed_torrents = self.__batch_action(downloader_obj=downlader_obj,
+                                                                     torrents=torrents,
+                                                                     deadline=deadline)
+            metrics.count("sent", len(done_torrents) + len(failed_torrents))
+            metrics.count("failed", len(failed_torrents))
+            if self._event.is_set():
+                logger.info(f"自动删种服务停止")
+                metrics.finish("停止")
+                return None
+            status = "完成"
+            if time.monotonic() > deadline:
+                logger.warn(f"自动删种任务 {downloader} 处理超时，剩余种子下次处理")
+                status = "超时"
+            # 按实际处理成功的种子数通知，失败和因超时未处理的种子分别注明
+            message_text = f"{downloader.title()} 共{action_text}{len(done_torrents)}{unit_text}"
+            if failed_torrents:
+                message_text = f"{message_text}，失败{len(failed_torrents)}个"
+            unsent = len(torrents) - len(done_torrents) - len(failed_torrents)
+            if unsent:
+                message_text = f"{message_text}，未处理{unsent}个"
+            if self._action == "deletefile" and done_torrents:
+                message_text = f"{message_text}，{self.__freed_summary(done_torrents)}"
+            with metrics.phase("notify"):
+                text_items = []
+                for torrent in done_torrents:
+                    text_item = torrent_text(torrent, format_size=StringUtils.str_filesize,
+                                             with_site=self._action != "deletefile")
+                    logger.info(f"自动删种任务 {log_title}：{text_item}")
+                    text_items.append(text_item)
+                report = (message_text, text_items) if torrents else None
+                if report and notify:
+                    self.__send_report(title=message_text, text_items=text_items)
+            metrics.finish(status)
+            return None if notify else report
+        except TimeoutError as e:
+            logger.warn(f"自动删种任务 {downloader} {str(e)}，放弃本次运行")
+            metrics.finish("超时")
             return None
-        if self._trackerkeywords and not re.findall(self._trackerkeywords, torrent.tracker, re.I):
+        except Exception as e:
+            logger.error(f"自动删种任务 {downloader} 异常：{str(e)}")
+            metrics.finish("异常")
             return None
-        if self._torrentstates and torrent.state not in self._torrentstates:
+        finally:
+            downloader_lock.release()
+
+    @staticmethod
+    def __freed_summary(torrents: List[dict]) -> str:
+        """
+        删除文件实际释放空间的摘要
+        """
+        sizes = [torrent.get("freed") for torrent in torrents]
+        known = [size for size in sizes if size is not None]
+        summary = f"实际释放{StringUtils.str_filesize(sum(known))}"
+        if len(known) < len(sizes):
+            summary += f"（{len(sizes) - len(known)}个种子的文件无法访问，未计入）"
+        return summary
+
+    def __batch_action(self, downloader_obj: Any, torrents: List[dict],
+                       deadline: float = None) -> Tuple[List[dict], List[dict]]:
+        """
+        按批次暂停/删除种子，每批之间检查停止事件和超时，返回成功和失败的种子
+        """
+        done_torrents = []
+        failed_torrents = []
+        batch_size = self.__get_batch_size()
+        for i in range(0, len(torrents), batch_size):
+            if self._event.is_set() or (deadline and time.monotonic() > deadline):
+                break
+            batch = torrents[i:i + batch_size]
+            ids = [torrent.get("id") for torrent in batch]
+            try:
+                if self._action == "pause":
+                    state = downloader_obj.stop_torrents(ids=ids)
+                else:
+                    state = downloader_obj.delete_torrents(delete_file=self._action == "deletefile",
+                                                           ids=ids)
+            except Exception as e:
+                logger.error(f"自动删种任务 第{i // batch_size + 1}批处理异常：{str(e)}")
+                state = False
+            if state:
+                done_torrents.extend(batch)
+            else:
+                logger.error(f"自动删种任务 第{i // batch_size + 1}批 {len(batch)} 个种子处理失败：{','.join(ids)}")
+                failed_torrents.extend(batch)
+        return done_torrents, failed_torrents
+
+    def __get_batch_size(self) -> int:
+        """
+        每批处理的种子数
+        """
+        try:
+            return max(int(self._batchsize), 1)
+        except (TypeError, ValueError):
+            return 100
+
+    def __check_torrent(self, torrent: TorrentRecord, now: int = None,
+                        state_cache: TorrentStateCache = None) -> Optional[dict]:
+        """
+        检查下载任务是否符合条件
+        """
+        if not self._rules:
             return None
-        if self._torrentcategorys and (not torrent.category or torrent.category not in self._torrentcategorys):
+        if state_cache:
+            matched = state_cache.match_static(torrent.hash, lambda: self._rules.match_static(torrent))
+        else:
+            matched = self._rules.match_static(torrent)
+        if not matched or not self._rules.match_seeding(torrent, now):
             return None
+        return self.__to_item(torrent)
+
+    def __to_item(self, torrent: TorrentRecord) -> dict:
+        """
+        转换为待处理种子信息
+        """
         return {
             "id": torrent.hash,
             "name": torrent.name,
-            "site": StringUtils.get_url_sld(torrent.tracker),
+            "site": torrent.site if torrent.site is not None else self._site_memo(torrent.trackers[0]),
             "size": torrent.size
         }
 
-    def __get_tr_torrent(self, torrent: Any) -> Optional[dict]:
-        """
-        检查TR下载任务是否符合条件
-        """
-        # 完成时间
-        date_done = torrent.date_done or torrent.date_added
-        # 现在时间
-        date_now = int(time.mktime(datetime.now().timetuple()))
-        # 做种时间
-        torrent_seeding_time = date_now - int(time.mktime(date_done.timetuple())) if date_done else 0
-        # 上传量
-        torrent_uploaded = torrent.ratio * torrent.total_size
-        # 平均上传速茺
-        torrent_upload_avs = torrent_uploaded / torrent_seeding_time if torrent_seeding_time else 0
-        # 大小 单位：GB
-        sizes = self._size.split('-') if self._size else []
-        minsize = float(sizes[0]) * 1024 * 1024 * 1024 if sizes else 0
-        maxsize = float(sizes[-1]) * 1024 * 1024 * 1024 if sizes else 0
-        # 分享率
-        if self._ratio and torrent.ratio <= float(self._ratio):
-            return None
-        if self._time and torrent_seeding_time <= float(self._time) * 3600:
-            return None
-        if self._size and (torrent.total_size >= int(maxsize) or torrent.total_size <= int(minsize)):
-            return None
-        if self._upspeed and torrent_upload_avs >= float(self._upspeed) * 1024:
-            return None
-        if self._pathkeywords and not re.findall(self._pathkeywords, torrent.download_dir, re.I):
-            return None
-        if self._trackerkeywords:
-            if not torrent.trackers:
-                return None
-            else:
-                tacker_key_flag = False
-                for tracker in torrent.trackers:
-                    if re.findall(self._trackerkeywords, tracker.get("announce", ""), re.I):
-                        tacker_key_flag = True
-                        break
-                if not tacker_key_flag:
-                    return None
-        if self._errorkeywords and not re.findall(self._errorkeywords, torrent.error_string, re.I):
-            return None
-        return {
-            "id": torrent.hashString,
-            "name": torrent.name,
-            "site": torrent.trackers[0].get("sitename") if torrent.trackers else "",
-            "size": torrent.total_size
-        }
-
-    def get_remove_torrents(self, downloader: str):
+    def get_remove_torrents(self, downloader: str, service: ServiceInfo = None, metrics: RunMetrics = None,
+                            deadline: float = None):
         """
         获取自动删种任务种子
+        :param deadline: 超时时间（time.monotonic），获取种子、条件检查或空间统计完成时已超时则抛出TimeoutError
         """
         remove_torrents = []
+        metrics = metrics or RunMetrics(downloader)
+        service = service or self.__get_service(downloader)
+        if not service:
+            return []
         # 下载器对象
-        downloader_obj = self.__get_downloader(downloader)
-        downloader_config = self.__get_downloader_config(downloader)
+        downloader_obj = service.instance
+        downloader_config = service.config
         # 标题
         if self._labels:
             tags = self._labels.split(',')
@@ -793,59 +1181,216 @@ class AutoDeleteTorrent(_PluginBase):
         if self._mponly:
             tags.append(settings.TORRENT_TAG)
         # 查询种子
-        torrents, error_flag = downloader_obj.get_torrents(tags=tags or None)
+        with metrics.phase("fetch"):
+            state_cache = None
+            if self._incremental:
+                state_cache = self.__get_state_cache(downloader, downloader_config.type)
+                try:
+                    state_cache.refresh(downloader_obj)
+                    torrents, error_flag = state_cache.torrents(tags=tags), False
+                except Exception as e:
+                    logger.error(f"自动删种任务 {downloader} 增量同步种子失败：{str(e)}")
+                    torrents, error_flag = [], True
+            else:
+                torrents, error_flag = self.__fetch_torrents(downloader=downloader,
+                                                             downloader_obj=downloader_obj,
+                                                             downloader_type=downloader_config.type,
+                                                             tags=tags)
         if error_flag:
+            # 下载器可能已断开，下次运行重新解析服务
+            self.__clear_service_infos()
             return []
-        # 处理种子
-        for torrent in torrents:
-            if downloader_config.type == "qbittorrent":
-                item = self.__get_qb_torrent(torrent)
-            else:
-                item = self.__get_tr_torrent(torrent)
-            if not item:
-                continue
-            remove_torrents.append(item)
+        metrics.count("fetched", len(torrents))
+        self.__check_deadline(deadline, "获取种子")
+        # 处理种子，同时缓存每个种子的检查结果，辅种比对时复用
+        verdicts = {}
+        memo_stats = self.__memo_stats()
+        now = int(time.time())
+        with metrics.phase("filter"):
+            # 向量化检查
+            matches = None
+            if self._vectorize and self._rules:
+                if vectorize.is_available():
+                    matches = vectorize.match_torrents(rules=self._rules, torrents=torrents, now=now)
+                else:
+                    logger.warn("自动删种任务 未安装numpy，无法使用向量化检查")
+            for index, torrent in enumerate(torrents):
+                if matches is not None:
+                    item = self.__to_item(torrent) if matches[index] else None
+                else:
+                    item = self.__check_torrent(torrent, now=now, state_cache=state_cache)
+                verdicts[torrent.hash] = item
+                if not item:
+                    continue
+                remove_torrents.append(item)
+        metrics.count("candidates", len(remove_torrents))
+        self.__check_deadline(deadline, "条件检查")
         # 处理辅种
         if self._samedata and remove_torrents:
-            remove_ids = [t.get("id") for t in remove_torrents]
-            remove_torrents_plus = []
-            temp_remove_torrents = []
-            for remove_torrent in remove_torrents:
-                name = remove_torrent.get("name")
-                size = remove_torrent.get("size")
-                for torrent in torrents:
-                    if downloader_config.type == "qbittorrent":
-                        plus_id = torrent.hash
-                        plus_name = torrent.name
-                        plus_size = torrent.size
-                        plus_site = StringUtils.get_url_sld(torrent.tracker)
-                    else:
-                        plus_id = torrent.hashString
-                        plus_name = torrent.name
-                        plus_size = torrent.total_size
-                        plus_site = torrent.trackers[0].get("sitename") if torrent.trackers else ""
-                    # 比对名称和大小
-                    if plus_name == name \
-                            and plus_size == size \
-                            and plus_id not in remove_ids:
-                         # 判断辅种是否符合删除条件
-                        if downloader_config.type == "qbittorrent":
-                            item = self.__get_qb_torrent(torrent)
-                        else:
-                            item = self.__get_tr_torrent(torrent)
-
-                        if item:
-                            remove_torrents_plus.append({
-                                "id": plus_id,
-                                "name": plus_name,
-                                "site": plus_site,
-                                "size": plus_size
-                            })
-                        else:
-                            temp_remove_torrents.append(remove_torrent)
-                            logger.warn(f"{name} 存在不满足删除条件的辅种, 本次跳过")
-            temp_remove_torrents_ids = {obj["id"] for obj in temp_remove_torrents}
-            remove_torrents[:] = [obj for obj in remove_torrents if obj["id"] not in temp_remove_torrents_ids]
-            if remove_torrents_plus:
-                remove_torrents.extend(remove_torrents_plus)
-        return remove_torrents
\ No newline at end of file
+            with metrics.phase("samedata"):
+                remove_torrents = self.__resolve_samedata(torrents=torrents,
+                                                          remove_torrents=remove_torrents,
+                                                          verdicts=verdicts,
+                                                          metrics=metrics)
+        # 删除文件时按inode索引计算实际释放的空间，空间规划和释放统计共用
+        index = InodeIndex() if self._action == "deletefile" else None
+        # 按目标可用空间选择需要删除的种子
+        free_space_target = self.__free_space_target()
+        if free_space_target and remove_torrents:
+            with metrics.phase("plan"):
+                remove_torrents = self.__plan_reclaim(downloader=downloader,
+                                                      torrents=torrents,
+                                                      remove_torrents=remove_torrents,
+                                                      target=free_space_target,
+                                                      index=index,
+                                                      now=now,
+                                                      metrics=metrics)
+        # 统计删除文件实际释放的空间
+        if index and remove_torrents:
+            with metrics.phase("space"):
+                remove_torrents = self.__account_space(downloader=downloader,
+                                                       torrents=torrents,
+                                                       remove_torrents=remove_torrents,
+                                                       index=index,
+                                                       metrics=metrics)
+        for name, (hits, misses) in self.__memo_stats().items():
+            old_hits, old_misses = memo_stats.get(name, (0, 0))
+            metrics.cache(name, hits - old_hits, misses - old_misses)
+        self.__check_deadline(deadline, "处理辅种和空间统计")
+        return remove_torrents
+
+    @staticmethod
+    def __check_deadline(deadline: Optional[float], stage: str):
+        """
+        超时后抛出TimeoutError，避免按过时的种子状态执行动作
+        """
+        if deadline and time.monotonic() > deadline:
+            raise TimeoutError(f"{stage}超时")
+
+    def __free_space_target(self) -> int:
+        """
+        目标可用空间（字节），只有删除种子和文件时生效，未设置或不合法时为0
+        """
+        if not self._free_space or self._action != "deletefile":
+            return 0
+        try:
+            return max(int(float(self._free_space) * 1024 ** 3), 0)
+        except ValueError:
+            return 0
+
+    def __plan_reclaim(self, downloader: str, torrents: List[TorrentRecord], remove_torrents: List[dict],
+                       target: int, index: InodeIndex, now: int, metrics: RunMetrics) -> List[dict]:
+        """
+        读取各下载目录所在磁盘的可用空间，按保留价值从低到高删除，辅种整组删除，达到目标后保留其余种子
+        """
+        records = {torrent.hash: torrent for torrent in torrents}
+        candidates = [records[item.get("id")] for item in remove_torrents if item.get("id") in records]
+        path_disks, free_spaces = read_disks(torrent.save_path for torrent in candidates)
+        for path in {torrent.save_path for torrent in candidates} - path_disks.keys():
+            logger.warn(f"自动删种任务 {downloader} 无法读取下载目录 {path} 的可用空间，该目录下的种子本次跳过")
+        deficits = {device: target - free for device, free in free_spaces.items()}
+        units = build_units(torrents=torrents, candidates=candidates, path_disks=path_disks, index=index, now=now)
+        selected, remaining = plan_reclaim(units=units, deficits=deficits)
+        disk_paths = {device: path for path, device in path_disks.items()}
+        for device, free in free_spaces.items():
+            if deficits[device] > 0 and remaining[device] > 0:
+                logger.warn(f"自动删种任务 {downloader} 下载目录 {disk_paths.get(device)} "
+                            f"删除所有能释放空间的种子后仍未达到目标可用空间")
+            logger.info(f"自动删种任务 {downloader} 下载目录 {disk_paths.get(device)} "
+                        f"可用空间 {StringUtils.str_filesize(free)}，目标 {StringUtils.str_filesize(target)}，"
+                        f"计划释放 {StringUtils.str_filesize(deficits[device] - remaining[device])}")
+        hashes = {torrent_hash for unit in selected for torrent_hash in unit.hashes}
+        metrics.count("space_kept", len(remove_torrents) - len(hashes))
+        return [item for item in remove_torrents if item.get("id") in hashes]
+
+    def __account_space(self, downloader: str, torrents: List[TorrentRecord], remove_torrents: List[dict],
+                        index: InodeIndex, metrics: RunMetrics) -> List[dict]:
+        """
+        按inode索引计算每个种子删除文件后实际释放的空间，记录在freed中，文件无法访问时为None
+        同一数据路径的辅种只在第一个种子上计入释放空间
+        """
+        records = {torrent.hash: torrent for torrent in torrents}
+        data_paths = {}
+        for item in remove_torrents:
+            torrent = records.get(item.get("id"))
+            if not torrent:
+                continue
+            data_paths[torrent.hash] = torrent.data_path
+            index.add(torrent.data_path)
+        if self._skip_unfreed:
+            freed, excluded = index.plan(data_paths.values())
+        else:
+            freed, excluded = index.freed(data_paths.values())[0], set()
+        results = []
+        counted = set()
+        for item in remove_torrents:
+            path = data_paths.get(item.get("id"))
+            if path in excluded:
+                logger.info(f"自动删种任务 {downloader} {item.get('name')} 的文件仍有其他硬链接，删除不释放空间，本次跳过")
+                continue
+            if path is not None and freed.get(path) is not None:
+                item["freed"] = 0 if path in counted else freed[path]
+                counted.add(path)
+            results.append(item)
+        metrics.count("unfreed_skipped", len(remove_torrents) - len(results))
+        return results
+
+    def __memo_stats(self) -> Dict[str, Tuple[int, int]]:
+        """
+        各缓存累计的命中、未命中次数，多个下载器同时处理时单次运行的差值为近似值
+        """
+        stats = self._rules.memo_stats() if self._rules else {}
+        stats["site"] = self._site_memo.stats()
+        return stats
+
+    def __fetch_torrents(self, downloader: str, downloader_obj: Any, downloader_type: str,
+                         tags: List[str]) -> Tuple[List[TorrentRecord], bool]:
+        """
+        查询种子，尽量将过滤条件交给下载器处理以减少传输和解析的数据量，
+        返回的原始对象立即转换为精简记录，不再保留
+        """
+        try:
+            if downloader_type == "qbittorrent":
+                kwargs = {}
+                # QB只支持按单个标签过滤，其余标签在本地过滤
+                if tags:
+                    kwargs["tag"] = tags[0]
+                # 处理辅种或按目标空间删除时需获取全部种子，不满足分类、状态条件的辅种也要参与比对
+                if not self._samedata and not self.__free_space_target() and self._rules:
+                    if len(self._rules.torrentcategorys) == 1:
+                        kwargs["category"] = next(iter(self._rules.torrentcategorys))
+                    status_filter = qb_status_filter(self._rules.torrentstates)
+                    if status_filter:
+                        kwargs["status_filter"] = status_filter
+                torrents = [from_qb(torrent) for torrent in downloader_obj.qbc.torrents_info(**kwargs) or []]
+            else:
+                # TR只获取删种条件需要的字段
+                torrents = [from_tr(torrent) for torrent in
+                            downloader_obj.trc.get_torrents(arguments=TR_FIELDS) or []]
+        except Exception as e:
+            logger.error(f"自动删种任务 {downloader} 获取种子失败：{str(e)}")
+            return [], True
+        return filter_tags(torrents, tags=tags), False
+
+    def __get_state_cache(self, downloader: str, downloader_type: str) -> TorrentStateCache:
+        """
+        获取下载器的种子状态缓存
+        """
+        state_cache = self._state_caches.get(downloader)
+        if not state_cache or state_cache.downloader_type != downloader_type:
+            state_cache = TorrentStateCache(downloader_type=downloader_type)
+            self._state_caches[downloader] = state_cache
+        return state_cache
+
+    def __resolve_samedata(self, torrents: List[TorrentRecord], remove_torrents: List[dict],
+                           verdicts: Dict[str, Optional[dict]], metrics: RunMetrics) -> List[dict]:
+        """
+        处理辅种，任一辅种不满足删除条件时整组跳过
+        """
+        results, plus_torrents, skipped = resolve_samedata(torrents=torrents,
+                                                           remove_torrents=remove_torrents,
+                                                           verdicts=verdicts)
+        metrics.count("samedata_skipped", len(skipped))
+        for remove_torrent in skipped:
+            logger.warn(f"{remove_torrent.get('name')} 存在不满足删除条件的辅种, 本次跳过")
+        return results + [self.__to_item(torrent) for torrent in plus_torrents]
@@ -0,0 +1,99 @@
+import os
+import stat
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# (设备号, inode号)
+FileKey = Tuple[int, int]
+
+
+class InodeIndex:
+    """
+    待删除种子数据文件的inode索引，按(设备号, inode号, 链接数)计算删除后实际释放的空间
+    硬链接到媒体库或被其他目录引用的文件，只有所有链接都在删除范围内时才释放空间
+    """
+
+    def __init__(self):
+        # 数据路径 -> [(设备号, inode号)]，无法访问的路径为None
+        self._paths: Dict[str, Optional[List[FileKey]]] = {}
+        # (设备号, inode号) -> (链接数, 占用字节数)
+        self._inodes: Dict[FileKey, Tuple[int, int]] = {}
+
+    def add(self, path: str) -> bool:
+        """
+        索引种子的数据路径（文件或目录），路径不存在或无法访问时返回False
+        """
+        if path not in self._paths:
+            self._paths[path] = self.__scan(path)
+        return self._paths[path] is not None
+
+    def __scan(self, path: str) -> Optional[List[FileKey]]:
+        try:
+            st = os.lstat(path)
+        except OSError:
+            return None
+        if not stat.S_ISDIR(st.st_mode):
+            return [self.__add_inode(st)] if stat.S_ISREG(st.st_mode) else []
+        keys = []
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    st = os.lstat(os.path.join(root, name))
+                except OSError:
+                    continue
+                if stat.S_ISREG(st.st_mode):
+                    keys.append(self.__add_inode(st))
+        return keys
+
+    def __add_inode(self, st: os.stat_result) -> FileKey:
+        key = (st.st_dev, st.st_ino)
+        # 按实际分配的块计算，稀疏文件和未下载完的文件不按名义大小计算
+        blocks = getattr(st, "st_blocks", None)
+        self._inodes[key] = (st.st_nlink, blocks * 512 if blocks is not None else st.st_size)
+        return key
+
+    def freed(self, paths: Iterable[str]) -> Tuple[Dict[str, Optional[int]], Set[str]]:
+        """
+        计算删除一组数据路径释放的空间
+        同一文件只计入第一个引用它的路径，路径中任一文件的所有链接都在删除范围内时视为能释放空间
+        :return: 路径 -> 计入的释放字节数（无法访问时为None）、能释放空间的路径
+        """
+        paths = list(dict.fromkeys(paths))
+        # (设备号, inode号) -> 删除范围内的链接数
+        links: Dict[FileKey, int] = {}
+        for path in paths:
+            for key in self._paths.get(path) or []:
+                links[key] = links.get(key, 0) + 1
+        released = {key for key, count in links.items() if count >= self._inodes[key][0]}
+        result: Dict[str, Optional[int]] = {}
+        releasing = set()
+        counted = set()
+        for path in paths:
+            keys = self._paths.get(path)
+            if keys is None:
+                result[path] = None
+                continue
+            size = 0
+            for key in keys:
+                if key not in released:
+                    continue
+                releasing.add(path)
+                if key not in counted:
+                    counted.add(key)
+                    size += self._inodes[key][1]
+            result[path] = size
+        return result, releasing
+
+    def plan(self, paths: Iterable[str]) -> Tuple[Dict[str, Optional[int]], Set[str]]:
+        """
+        排除不释放空间的路径，排除后其他路径可能因硬链接不再全部删除而不释放空间，重复计算直到稳定
+        无法访问的路径无法判断，保留在删除范围内
+        :return: 保留路径的释放字节数、被排除的路径
+        """
+        paths = list(dict.fromkeys(paths))
+        excluded: Set[str] = set()
+        while True:
+            result, releasing = self.freed(path for path in paths if path not in excluded)
+            unfreed = {path for path, size in result.items() if size is not None and path not in releasing}
+            if not unfreed:
+                return result, excluded
+            excluded |= unfreed
@@ -0,0 +1,50 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LruCache(Generic[K, V]):
+    """
+    有容量上限的计算结果缓存，超出容量时淘汰最久未使用的项，并统计命中次数
+    """
+
+    def __init__(self, compute: Callable[[K], V], maxsize: int = 4096):
+        self._compute = compute
+        self._maxsize = maxsize
+        self._data: "OrderedDict[K, V]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, key: K) -> V:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+        value = self._compute(key)
+        with self._lock:
+            self._data[key] = value
+            if len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def stats(self) -> Tuple[int, int]:
+        """
+        命中、未命中次数
+        """
+        with self._lock:
+            return self.hits, self.misses
+
+    def clear(self):
+        """
+        清空缓存和统计
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
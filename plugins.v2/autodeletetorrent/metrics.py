@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+# 阶段名称
+PHASES = {
+    "fetch": "获取种子",
+    "filter": "条件检查",
+    "samedata": "辅种比对",
+    "plan": "空间规划",
+    "space": "空间统计",
+    "action": "执行动作",
+    "notify": "发送通知"
+}
+
+# 缓存名称
+CACHES = {
+    "tracker": "Tracker缓存命中率",
+    "path": "路径缓存命中率",
+    "site": "站点缓存命中率"
+}
+
+# 统计项名称
+COUNTERS = {
+    "fetched": "种子数",
+    "candidates": "符合条件",
+    "samedata_skipped": "辅种跳过",
+    "space_kept": "空间充足保留",
+    "unfreed_skipped": "不释放空间跳过",
+    "sent": "已发送",
+    "failed": "失败"
+}
+
+
+class RunMetrics:
+    """
+    单个下载器一次运行的各阶段耗时和数量统计
+    """
+
+    def __init__(self, downloader: str):
+        self.downloader = downloader
+        self.start_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.status = "运行中"
+        # 阶段 -> 耗时（秒）
+        self.phases: Dict[str, float] = {}
+        # 统计项 -> 数量
+        self.counters: Dict[str, int] = {}
+        # 缓存 -> (命中, 未命中)
+        self.caches: Dict[str, Tuple[int, int]] = {}
+        self._start = time.perf_counter()
+        self._elapsed = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        记录阶段耗时
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - start
+
+    def count(self, name: str, value: int = 1):
+        """
+        累加统计项
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def cache(self, name: str, hits: int, misses: int):
+        """
+        记录缓存命中次数
+        """
+        old_hits, old_misses = self.caches.get(name, (0, 0))
+        self.caches[name] = (old_hits + hits, old_misses + misses)
+
+    def cache_rates(self) -> Dict[str, float]:
+        """
+        缓存命中率
+        """
+        return {name: round(hits / (hits + misses), 4)
+                for name, (hits, misses) in self.caches.items() if hits + misses}
+
+    def finish(self, status: str):
+        """
+        结束本次运行
+        """
+        self.status = status
+        self._elapsed = time.perf_counter() - self._start
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为字典
+        """
+        elapsed = self._elapsed if self._elapsed is not None else time.perf_counter() - self._start
+        return {
+            "downloader": self.downloader,
+            "start_time": self.start_time,
+            "status": self.status,
+            "elapsed": round(elapsed, 3),
+            "phases": {name: round(value, 3) for name, value in self.phases.items()},
+            "counters": dict(self.counters),
+            "cache_hit_rates": self.cache_rates()
+        }
+
+
+class MetricsRecorder:
+    """
+    保存最近若干次运行统计的环形缓冲区
+    """
+
+    def __init__(self, maxlen: int = 50):
+        self._runs = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def start(self, downloader: str) -> RunMetrics:
+        """
+        开始记录一次运行
+        """
+        run = RunMetrics(downloader)
+        with self._lock:
+            self._runs.append(run)
+        return run
+
+    def recent(self) -> List[Dict[str, Any]]:
+        """
+        最近的运行统计，最新的在前
+        """
+        with self._lock:
+            runs = list(self._runs)
+        return [run.to_dict() for run in reversed(runs)]
+
+    def clear(self):
+        """
+        清空统计
+        """
+        with self._lock:
+            self._runs.clear()
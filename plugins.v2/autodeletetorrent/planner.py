@@ -0,0 +1,119 @@
+import heapq
+import os
+import shutil
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Tuple
+
+from .inodes import InodeIndex
+from .records import TorrentRecord
+
+
+@dataclass
+class ReclaimUnit:
+    """
+    一次删除的最小单位：同名同大小的一组辅种
+    """
+    # 组内符合条件的种子
+    hashes: List[str] = field(default_factory=list)
+    # 组内种子的保留价值之和
+    value: float = 0
+    # 磁盘 -> 删除后实际释放的字节数
+    freed: Dict[int, int] = field(default_factory=dict)
+
+    @property
+    def freed_size(self) -> int:
+        return sum(self.freed.values())
+
+
+def torrent_value(torrent: TorrentRecord, now: int) -> float:
+    """
+    种子的保留价值，分享率越高、平均上传速度越快价值越高，完成时间越久价值越低
+    """
+    age = max(now - torrent.done_time, 0)
+    # 平均上传速度 单位：KB/s
+    speed = torrent.uploaded / max(now - torrent.added_on, 1) / 1024
+    return (1 + torrent.ratio) * (1 + speed) / (1 + age / 86400)
+
+
+def read_disks(paths: Iterable[str]) -> Tuple[Dict[str, int], Dict[int, int]]:
+    """
+    读取下载目录所在磁盘及可用空间，无法访问的目录不返回
+    :return: 目录 -> 磁盘设备号，磁盘设备号 -> 可用字节数
+    """
+    path_disks = {}
+    free_spaces = {}
+    for path in set(paths):
+        try:
+            device = os.stat(path).st_dev
+            if device not in free_spaces:
+                free_spaces[device] = shutil.disk_usage(path).free
+        except OSError:
+            continue
+        path_disks[path] = device
+    return path_disks, free_spaces
+
+
+def build_units(torrents: List[TorrentRecord], candidates: List[TorrentRecord],
+                path_disks: Dict[str, int], index: InodeIndex, now: int) -> List[ReclaimUnit]:
+    """
+    按名称和大小将符合条件的种子分组，同一目录下的数据只有所有引用它的种子都删除时才释放空间，
+    释放空间按inode索引计算，硬链接到媒体库等删除范围外的文件不计入，不释放空间的组不返回
+    :param torrents: 下载器中的种子
+    :param candidates: 符合删除条件的种子
+    :param path_disks: 目录 -> 磁盘设备号，不在其中的种子无法计算释放空间，不参与分组
+    :param index: 种子数据的inode索引
+    """
+    # (名称, 大小, 目录) -> 引用该数据的种子数
+    references: Dict[Tuple[str, int, str], int] = {}
+    for torrent in torrents:
+        key = (torrent.name, torrent.size, torrent.save_path)
+        references[key] = references.get(key, 0) + 1
+    # (名称, 大小, 目录) -> 符合条件的种子数
+    removing: Dict[Tuple[str, int, str], int] = {}
+    units: Dict[Tuple[str, int], ReclaimUnit] = {}
+    for torrent in candidates:
+        if torrent.save_path not in path_disks:
+            continue
+        key = (torrent.name, torrent.size, torrent.save_path)
+        removing[key] = removing.get(key, 0) + 1
+        unit = units.setdefault((torrent.name, torrent.size), ReclaimUnit())
+        unit.hashes.append(torrent.hash)
+        unit.value += torrent_value(torrent, now)
+    # (名称, 大小) -> [(数据路径, 磁盘设备号)]
+    unit_paths: Dict[Tuple[str, int], List[Tuple[str, int]]] = {}
+    for (name, size, save_path), count in removing.items():
+        if count >= references.get((name, size, save_path), 0):
+            path = os.path.join(save_path, name)
+            index.add(path)
+            unit_paths.setdefault((name, size), []).append((path, path_disks[save_path]))
+    for key, paths in unit_paths.items():
+        sizes, _ = index.freed(path for path, _ in paths)
+        freed = units[key].freed
+        for path, device in paths:
+            if sizes.get(path):
+                freed[device] = freed.get(device, 0) + sizes[path]
+    return [unit for unit in units.values() if unit.freed_size > 0]
+
+
+def plan_reclaim(units: List[ReclaimUnit], deficits: Dict[int, int]) -> Tuple[List[ReclaimUnit], Dict[int, int]]:
+    """
+    按每GB释放空间的保留价值从低到高选择删除单位，直到各磁盘的空间缺口都已补足
+    不释放空间或只释放已满足目标的磁盘空间的单位跳过
+    :param deficits: 磁盘设备号 -> 距离目标还差的字节数
+    :return: 选中的删除单位、各磁盘剩余的空间缺口
+    """
+    deficits = dict(deficits)
+    heap = [(unit.value / (unit.freed_size / 1024 ** 3), order, unit)
+            for order, unit in enumerate(units) if unit.freed_size > 0]
+    heapq.heapify(heap)
+    selected = []
+    while heap and any(deficit > 0 for deficit in deficits.values()):
+        _, _, unit = heapq.heappop(heap)
+        if not any(deficits.get(device, 0) > 0 for device in unit.freed):
+            continue
+        selected.append(unit)
+        for device, size in unit.freed.items():
+            if device in deficits:
+                deficits[device] -= size
+    return selected, deficits
+
@@ -0,0 +1,135 @@
+import os
+import time
+from typing import Any, FrozenSet, Optional, Tuple
+
+
+class TorrentRecord:
+    """
+    下载任务的精简记录，获取种子后立即转换，只保留删种条件、辅种比对和通知需要的字段，
+    下载器返回的原始对象不再保留
+    QB记录的error为None，TR记录的state、category为None，表示该条件不适用
+    """
+    __slots__ = ("hash", "name", "size", "ratio", "uploaded", "added_on", "completion_on",
+                 "save_path", "trackers", "site", "state", "category", "error", "tags")
+
+    def __init__(self, hash: str, name: str, size: int, ratio: float, uploaded: float,
+                 added_on: int, completion_on: int, save_path: str, trackers: Tuple[str, ...],
+                 site: Optional[str] = None, state: Optional[str] = None, category: Optional[str] = None,
+                 error: Optional[str] = None, tags: FrozenSet[str] = frozenset()):
+        self.hash = hash
+        self.name = name
+        # 大小 单位：B
+        self.size = size
+        self.ratio = ratio
+        # 上传量 单位：B
+        self.uploaded = uploaded
+        # 添加、完成时间戳，未完成时完成时间为0
+        self.added_on = added_on
+        self.completion_on = completion_on
+        self.save_path = save_path
+        # Tracker地址
+        self.trackers = trackers
+        # 站点名称，QB为None，通知时由Tracker地址解析
+        self.site = site
+        self.state = state
+        self.category = category
+        self.error = error
+        self.tags = tags
+
+    @property
+    def done_time(self) -> int:
+        """
+        完成时间戳，未完成时为添加时间
+        """
+        return self.completion_on if self.completion_on > 0 else self.added_on
+
+    @property
+    def data_path(self) -> str:
+        """
+        种子数据的文件或目录路径
+        """
+        return os.path.join(self.save_path, self.name)
+
+
+def _qb_tags(tags: Optional[str]) -> FrozenSet[str]:
+    """
+    解析QB的,分隔标签
+    """
+    return frozenset(tag.strip() for tag in (tags or "").split(","))
+
+
+def _timestamp(value: Any) -> int:
+    """
+    TR的日期转换为时间戳
+    """
+    return int(time.mktime(value.timetuple())) if value else 0
+
+
+def from_qb(torrent: Any) -> TorrentRecord:
+    """
+    转换QB下载任务
+    """
+    return TorrentRecord(
+        hash=torrent.hash,
+        name=torrent.name,
+        size=torrent.size,
+        ratio=torrent.ratio,
+        uploaded=torrent.uploaded,
+        added_on=torrent.added_on,
+        completion_on=torrent.completion_on,
+        save_path=torrent.save_path,
+        trackers=(torrent.tracker or "",),
+        state=torrent.state,
+        category=torrent.category or "",
+        tags=_qb_tags(getattr(torrent, "tags", None))
+    )
+
+
+# QB同步数据字段 -> 记录字段
+QB_FIELD_MAP = {
+    "name": "name",
+    "size": "size",
+    "ratio": "ratio",
+    "uploaded": "uploaded",
+    "added_on": "added_on",
+    "completion_on": "completion_on",
+    "save_path": "save_path",
+    "state": "state"
+}
+
+
+def update_qb(record: TorrentRecord, fields: dict):
+    """
+    按QB增量同步数据更新记录
+    """
+    for field, value in fields.items():
+        attr = QB_FIELD_MAP.get(field)
+        if attr:
+            setattr(record, attr, value)
+    if "tracker" in fields:
+        record.trackers = (fields["tracker"] or "",)
+    if "category" in fields:
+        record.category = fields["category"] or ""
+    if "tags" in fields:
+        record.tags = _qb_tags(fields["tags"])
+
+
+def from_tr(torrent: Any) -> TorrentRecord:
+    """
+    转换TR下载任务，上传量按分享率和大小计算
+    """
+    trackers = torrent.trackers or []
+    return TorrentRecord(
+        hash=torrent.hashString,
+        name=torrent.name,
+        size=torrent.total_size,
+        ratio=torrent.ratio,
+        uploaded=torrent.ratio * torrent.total_size,
+        added_on=_timestamp(torrent.date_added),
+        completion_on=_timestamp(torrent.date_done),
+        save_path=torrent.download_dir,
+        trackers=tuple(dict.fromkeys(tracker.get("announce", "") for tracker in trackers)),
+        site=trackers[0].get("sitename") if trackers else "",
+        error=torrent.error_string or "",
+        tags=frozenset(str(label).strip() for label in (torrent.labels or []))
+    )
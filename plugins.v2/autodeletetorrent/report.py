@@ -0,0 +1,66 @@
+from typing import Any, Callable, List
+
+
+def torrent_text(torrent: dict, format_size: Callable[[Any], str], with_site: bool = True) -> str:
+    """
+    种子的通知文本
+    """
+    text = f"{torrent.get('name')} "
+    if with_site:
+        text += f"来自站点：{torrent.get('site')} "
+    text += f"大小：{format_size(torrent.get('size'))}"
+    # 删除文件时实际释放的空间
+    if torrent.get("freed") is not None:
+        text += f" 释放：{format_size(torrent.get('freed'))}"
+    return text
+
+
+def build_message(title: str, text_items: List[str]) -> str:
+    """
+    组装通知内容
+    """
+    return "\n".join([title, *text_items])
+
+
+def paginate(title: str, text_items: List[str], max_length: int = 2000, max_pages: int = 5) -> List[str]:
+    """
+    按长度把通知内容分页，每页以标题开头，超过最大页数的种子只在最后一页注明数量
+    :param title: 通知标题，可包含多行
+    :param text_items: 每个种子的通知文本
+    :param max_length: 每页最大字符数
+    :param max_pages: 最大页数
+    """
+    # 每页正文可用的长度，预留页码的位置
+    room = max(max_length - len(title) - 10, 100)
+    pages: List[List[str]] = []
+    page: List[str] = []
+    length = 0
+    for item in text_items:
+        if len(item) > room:
+            item = item[:room - 3] + "..."
+        if page and length + len(item) + 1 > room:
+            pages.append(page)
+            page, length = [], 0
+        page.append(item)
+        length += len(item) + 1
+    if page:
+        pages.append(page)
+    if not pages:
+        return [title]
+
+    if len(pages) > max_pages:
+        pages = pages[:max_pages]
+        omitted = len(text_items) - sum(len(page) for page in pages)
+        last = pages[-1]
+        note = f"…… 其余{omitted}个种子详见插件日志"
+        # 最后一页放不下说明时移出部分种子
+        while last and sum(len(item) + 1 for item in last) + len(note) + 1 > room:
+            last.pop()
+            omitted += 1
+            note = f"…… 其余{omitted}个种子详见插件日志"
+        last.append(note)
+
+    total = len(pages)
+    if total == 1:
+        return [build_message(title, pages[0])]
+    return [build_message(f"{title}（{index}/{total}）", page) for index, page in enumerate(pages, start=1)]
@@ -0,0 +1,189 @@
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Optional, Pattern, Tuple
+
+from .memo import LruCache
+from .records import TorrentRecord
+
+# 1GB
+GB = 1024 * 1024 * 1024
+
+
+def _parse_float(value: Any, title: str) -> Optional[float]:
+    """
+    解析数值条件，未设置时返回None
+    """
+    if value is None or str(value).strip() == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{title}格式错误：{value}")
+
+
+def _parse_regex(value: Any, title: str) -> Optional[Pattern]:
+    """
+    预编译正则条件，未设置时返回None
+    """
+    if not value:
+        return None
+    try:
+        return re.compile(value, re.I)
+    except re.error as e:
+        raise ValueError(f"{title}正则表达式错误：{value} {str(e)}")
+
+
+def _parse_set(value: Any) -> FrozenSet[str]:
+    """
+    解析,分隔的条件为集合
+    """
+    if not value:
+        return frozenset()
+    return frozenset(item.strip() for item in str(value).split(",") if item.strip())
+
+
+@dataclass(frozen=True)
+class TorrentRules:
+    """
+    预编译的删种条件，插件初始化时解析一次，检查种子时不再解析配置
+    保存路径、Tracker地址的正则检查结果按值缓存，条件变化时随新实例一起重建
+    """
+    # 种子大小范围 单位：B
+    minsize: Optional[int] = None
+    maxsize: Optional[int] = None
+    # 分享率
+    ratio: Optional[float] = None
+    # 做种时间 单位：秒
+    seeding_time: Optional[float] = None
+    # 平均上传速度 单位：B/s
+    upspeed: Optional[float] = None
+    # 保存路径关键词
+    pathkeywords: Optional[Pattern] = None
+    # Tracker关键词
+    trackerkeywords: Optional[Pattern] = None
+    # 错误信息关键词（TR）
+    errorkeywords: Optional[Pattern] = None
+    # 任务状态（QB）
+    torrentstates: FrozenSet[str] = frozenset()
+    # 任务分类（QB）
+    torrentcategorys: FrozenSet[str] = frozenset()
+    # 正则检查结果缓存
+    path_memo: Optional[LruCache] = field(default=None, compare=False, repr=False)
+    tracker_memo: Optional[LruCache] = field(default=None, compare=False, repr=False)
+
+    def __post_init__(self):
+        if self.pathkeywords:
+            object.__setattr__(self, "path_memo",
+                               LruCache(lambda path: self.pathkeywords.search(path) is not None))
+        if self.trackerkeywords:
+            object.__setattr__(self, "tracker_memo",
+                               LruCache(lambda tracker: self.trackerkeywords.search(tracker) is not None))
+
+    @classmethod
+    def from_config(cls, config: dict) -> "TorrentRules":
+        """
+        从插件配置编译删种条件，配置不合法时抛出ValueError
+        """
+        config = config or {}
+        minsize = maxsize = None
+        size = str(config.get("size") or "").strip()
+        if size:
+            sizes = size.split("-")
+            try:
+                minsize = int(float(sizes[0]) * GB)
+                maxsize = int(float(sizes[-1]) * GB)
+            except ValueError:
+                raise ValueError(f"种子大小格式错误：{size}")
+        seeding_time = _parse_float(config.get("time"), "做种时间")
+        upspeed = _parse_float(config.get("upspeed"), "平均上传速度")
+        return cls(
+            minsize=minsize,
+            maxsize=maxsize,
+            ratio=_parse_float(config.get("ratio"), "分享率"),
+            seeding_time=seeding_time * 3600 if seeding_time is not None else None,
+            upspeed=upspeed * 1024 if upspeed is not None else None,
+            pathkeywords=_parse_regex(config.get("pathkeywords"), "保存路径关键词"),
+            trackerkeywords=_parse_regex(config.get("trackerkeywords"), "Tracker关键词"),
+            errorkeywords=_parse_regex(config.get("errorkeywords"), "错误信息关键词"),
+            torrentstates=_parse_set(config.get("torrentstates")),
+            torrentcategorys=_parse_set(config.get("torrentcategorys"))
+        )
+
+    def memo_stats(self) -> Dict[str, Tuple[int, int]]:
+        """
+        正则检查缓存的命中、未命中次数
+        """
+        stats = {}
+        if self.path_memo:
+            stats["path"] = self.path_memo.stats()
+        if self.tracker_memo:
+            stats["tracker"] = self.tracker_memo.stats()
+        return stats
+
+    def __match_static_numbers(self, size: int, ratio: float) -> bool:
+        """
+        检查分享率、大小
+        """
+        if self.ratio is not None and ratio <= self.ratio:
+            return False
+        if self.minsize is not None and (size >= self.maxsize or size <= self.minsize):
+            return False
+        return True
+
+    def __match_seeding(self, seeding_time: int, uploaded: float) -> bool:
+        """
+        检查做种时间、平均上传速度，结果随当前时间变化
+        """
+        if self.seeding_time is not None and seeding_time <= self.seeding_time:
+            return False
+        if self.upspeed is not None:
+            upload_avs = uploaded / seeding_time if seeding_time else 0
+            if upload_avs >= self.upspeed:
+                return False
+        return True
+
+    def match(self, torrent: TorrentRecord, now: Optional[int] = None) -> bool:
+        """
+        检查下载任务是否符合条件
+        """
+        return self.match_static(torrent) and self.match_seeding(torrent, now)
+
+    def match_static(self, torrent: TorrentRecord) -> bool:
+        """
+        检查下载任务与时间无关的条件，种子字段不变时结果不变
+        """
+        if not self.__match_static_numbers(size=torrent.size, ratio=torrent.ratio):
+            return False
+        return self.match_patterns(torrent)
+
+    def match_patterns(self, torrent: TorrentRecord) -> bool:
+        """
+        检查下载任务的路径、Tracker、状态和分类（QB）、错误信息（TR）
+        """
+        if self.path_memo and not self.path_memo(torrent.save_path):
+            return False
+        if self.tracker_memo and not any(self.tracker_memo(tracker) for tracker in torrent.trackers):
+            return False
+        if self.torrentstates and torrent.state is not None and torrent.state not in self.torrentstates:
+            return False
+        if self.torrentcategorys and torrent.category is not None \
+                and (not torrent.category or torrent.category not in self.torrentcategorys):
+            return False
+        if self.errorkeywords and torrent.error is not None and not self.errorkeywords.search(torrent.error):
+            return False
+        return True
+
+    def match_seeding(self, torrent: TorrentRecord, now: Optional[int] = None) -> bool:
+        """
+        检查下载任务的做种时间和平均上传速度
+        """
+        if self.seeding_time is None and self.upspeed is None:
+            return True
+        if now is None:
+            now = int(time.time())
+        # 完成时间
+        date_done = torrent.done_time
+        # 做种时间
+        seeding_time = now - date_done if date_done else 0
+        return self.__match_seeding(seeding_time=seeding_time, uploaded=torrent.uploaded)
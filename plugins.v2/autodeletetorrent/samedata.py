@@ -0,0 +1,39 @@
+from typing import Dict, List, Optional, Tuple
+
+from .records import TorrentRecord
+
+
+def resolve_samedata(torrents: List[TorrentRecord], remove_torrents: List[dict],
+                     verdicts: Dict[str, Optional[dict]]) -> Tuple[List[dict], List[TorrentRecord], List[dict]]:
+    """
+    按名称和大小建立辅种索引，任一辅种不满足删除条件时整组跳过
+    :param torrents: 下载器中的种子
+    :param remove_torrents: 符合删除条件的种子
+    :param verdicts: hash -> 种子检查结果
+    :return: 保留删除的种子、需一并删除的辅种、因辅种不满足条件跳过的种子
+    """
+    # (名称, 大小) -> [(hash, 种子)]
+    samedata_index: Dict[Tuple[str, int], List[Tuple[str, TorrentRecord]]] = {}
+    for torrent in torrents:
+        samedata_index.setdefault((torrent.name, torrent.size), []).append((torrent.hash, torrent))
+    remove_ids = {t.get("id") for t in remove_torrents}
+    # 已处理的辅种组
+    resolved_groups: Dict[Tuple[str, int], bool] = {}
+    plus_torrents = []
+    results = []
+    skipped = []
+    for remove_torrent in remove_torrents:
+        group_key = (remove_torrent.get("name"), remove_torrent.get("size"))
+        if group_key not in resolved_groups:
+            group_torrents = [(plus_id, torrent) for plus_id, torrent in samedata_index.get(group_key, [])
+                              if plus_id not in remove_ids]
+            # 判断辅种是否符合删除条件
+            group_ok = all(verdicts.get(plus_id) for plus_id, _ in group_torrents)
+            resolved_groups[group_key] = group_ok
+            if group_ok:
+                plus_torrents.extend(torrent for _, torrent in group_torrents)
+        if resolved_groups[group_key]:
+            results.append(remove_torrent)
+        else:
+            skipped.append(remove_torrent)
+    return results, plus_torrents, skipped
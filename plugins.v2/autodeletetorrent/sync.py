@@ -0,0 +1,156 @@
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set
+
+from .records import TorrentRecord, from_qb, from_tr, update_qb
+
+# 影响删种条件的QB种子字段，其它字段（速度、连接数等）变化时不重新检查
+QB_RULE_FIELDS = frozenset({
+    "name", "size", "ratio", "uploaded", "completion_on", "added_on",
+    "save_path", "tracker", "state", "category", "tags"
+})
+
+# 影响与时间无关删种条件的TR记录字段，全量同步后这些字段未变化的种子沿用检查结果
+TR_RULE_ATTRS = ("size", "ratio", "save_path", "trackers", "category", "state", "error")
+
+# TR同步时获取的种子字段
+TR_FIELDS = [
+    "id", "hashString", "name", "totalSize", "uploadRatio", "doneDate", "addedDate",
+    "downloadDir", "trackers", "errorString", "labels", "status"
+]
+
+# QB查询接口的状态过滤器及其包含的任务状态，按范围从小到大排列
+QB_STATUS_FILTERS = [
+    ("stalled_uploading", frozenset({"stalledUP"})),
+    ("stalled_downloading", frozenset({"stalledDL"})),
+    ("stalled", frozenset({"stalledUP", "stalledDL"})),
+    ("errored", frozenset({"error", "missingFiles"})),
+    ("seeding", frozenset({"uploading", "stalledUP", "checkingUP", "queuedUP", "forcedUP"})),
+    ("completed", frozenset({"uploading", "stalledUP", "checkingUP", "pausedUP", "stoppedUP",
+                             "queuedUP", "forcedUP"})),
+    ("downloading", frozenset({"downloading", "metaDL", "forcedMetaDL", "stalledDL", "checkingDL",
+                               "pausedDL", "stoppedDL", "queuedDL", "forcedDL"})),
+]
+
+
+def qb_status_filter(states: FrozenSet[str]) -> Optional[str]:
+    """
+    返回包含全部指定任务状态的最小QB状态过滤器，无法覆盖时返回None
+    """
+    if not states:
+        return None
+    for status_filter, filter_states in QB_STATUS_FILTERS:
+        if states.issubset(filter_states):
+            return status_filter
+    return None
+
+
+def filter_tags(torrents: Iterable[TorrentRecord], tags: Optional[List[str]]) -> List[TorrentRecord]:
+    """
+    仅保留包含全部指定标签的种子
+    """
+    if not tags:
+        return list(torrents)
+    tags = {str(tag).strip() for tag in tags}
+    return [torrent for torrent in torrents if tags.issubset(torrent.tags)]
+
+
+class TorrentStateCache:
+    """
+    下载器种子状态缓存
+    QB通过sync/maindata按rid获取增量，TR每次获取全部种子，仅对相关字段有变化的种子重新检查，
+    与时间无关的删种条件检查结果按种子缓存，仅在相关字段变化后重新检查，
+    种子以精简记录保存，不保留下载器返回的原始对象
+    """
+
+    def __init__(self, downloader_type: str):
+        self.downloader_type = downloader_type
+        # hash -> 种子记录
+        self._torrents: Dict[str, TorrentRecord] = {}
+        # 相关字段有变化、需重新检查的种子
+        self._dirty: Set[str] = set()
+        # hash -> 与时间无关条件的检查结果
+        self._verdicts: Dict[str, bool] = {}
+        # QB增量同步标识
+        self._rid = 0
+
+    def reset(self):
+        """
+        清空缓存，下次同步时全量获取
+        """
+        self._torrents = {}
+        self._dirty = set()
+        self._verdicts = {}
+        self._rid = 0
+
+    def refresh(self, downloader_obj: Any):
+        """
+        从下载器同步种子状态，同步失败时清空缓存并抛出异常
+        """
+        try:
+            if self.downloader_type == "qbittorrent":
+                self.__sync_qb(downloader_obj.qbc)
+            else:
+                self.__sync_tr(downloader_obj.trc)
+        except Exception:
+            self.reset()
+            raise
+
+    def __sync_qb(self, client: Any):
+        """
+        QB增量同步
+        """
+        data = client.sync_maindata(rid=self._rid)
+        if data.get("full_update"):
+            self._torrents = {}
+            self._verdicts = {}
+            self._dirty = set()
+        for torrent_hash, fields in (data.get("torrents") or {}).items():
+            torrent = self._torrents.get(torrent_hash)
+            if torrent is None:
+                self._torrents[torrent_hash] = from_qb(SimpleNamespace(**{**fields, "hash": torrent_hash}))
+                self._dirty.add(torrent_hash)
+            else:
+                update_qb(torrent, fields)
+                if not QB_RULE_FIELDS.isdisjoint(fields):
+                    self._dirty.add(torrent_hash)
+        for torrent_hash in data.get("torrents_removed") or []:
+            self.__remove(torrent_hash)
+        self._rid = data.get("rid") or 0
+
+    def __sync_tr(self, client: Any):
+        """
+        TR同步，recently-active只包含最近60秒内的变化，定时运行间隔通常更长，因此每次获取全部种子，
+        与时间无关条件相关的字段未变化的种子沿用上次的检查结果
+        """
+        torrents = {torrent.hashString: from_tr(torrent)
+                    for torrent in client.get_torrents(arguments=TR_FIELDS) or []}
+        for torrent_hash, torrent in torrents.items():
+            cached = self._torrents.get(torrent_hash)
+            if cached is None or any(getattr(cached, attr) != getattr(torrent, attr) for attr in TR_RULE_ATTRS):
+                self._dirty.add(torrent_hash)
+        for torrent_hash in self._torrents.keys() - torrents.keys():
+            self.__remove(torrent_hash)
+        self._torrents = torrents
+
+    def __remove(self, torrent_hash: str):
+        """
+        移除已删除的种子
+        """
+        self._torrents.pop(torrent_hash, None)
+        self._verdicts.pop(torrent_hash, None)
+        self._dirty.discard(torrent_hash)
+
+    def torrents(self, tags: Optional[List[str]] = None) -> List[TorrentRecord]:
+        """
+        当前缓存的种子，指定标签时仅返回包含全部标签的种子
+        """
+        return filter_tags(self._torrents.values(), tags=tags)
+
+    def match_static(self, torrent_hash: str, check: Callable[[], bool]) -> bool:
+        """
+        返回与时间无关条件的检查结果，种子相关字段变化后才重新检查
+        """
+        if torrent_hash in self._dirty or torrent_hash not in self._verdicts:
+            self._verdicts[torrent_hash] = check()
+            self._dirty.discard(torrent_hash)
+        return self._verdicts[torrent_hash]
@@ -0,0 +1,55 @@
+import time
+from typing import List, Optional, Sequence
+
+from .records import TorrentRecord
+from .rules import TorrentRules
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def is_available() -> bool:
+    """
+    是否可使用向量化检查
+    """
+    return np is not None
+
+
+def match_torrents(rules: TorrentRules, torrents: Sequence[TorrentRecord],
+                   now: Optional[int] = None) -> List[bool]:
+    """
+    向量化检查下载任务是否符合条件，结果与逐个检查一致
+    先将数值条件转换为列数据批量计算，正则、集合条件只检查数值条件通过的种子
+    """
+    if now is None:
+        now = int(time.time())
+    count = len(torrents)
+    if not count:
+        return []
+    sizes = np.fromiter((torrent.size for torrent in torrents), dtype=np.int64, count=count)
+    ratios = np.fromiter((torrent.ratio for torrent in torrents), dtype=np.float64, count=count)
+    mask = np.ones(count, dtype=bool)
+    # 分享率
+    if rules.ratio is not None:
+        mask &= ratios > rules.ratio
+    # 文件大小
+    if rules.minsize is not None:
+        mask &= (sizes < rules.maxsize) & (sizes > rules.minsize)
+    # 做种时间、平均上传速度
+    if rules.seeding_time is not None or rules.upspeed is not None:
+        done_times = np.fromiter((torrent.done_time for torrent in torrents), dtype=np.int64, count=count)
+        seeding_times = np.where(done_times != 0, now - done_times, 0)
+        if rules.seeding_time is not None:
+            mask &= seeding_times > rules.seeding_time
+        if rules.upspeed is not None:
+            uploaded = np.fromiter((torrent.uploaded for torrent in torrents), dtype=np.float64, count=count)
+            upload_avs = np.divide(uploaded, seeding_times, out=np.zeros(count, dtype=np.float64),
+                                   where=seeding_times != 0)
+            mask &= upload_avs < rules.upspeed
+    # 正则、集合条件
+    results = mask.tolist()
+    for index in np.flatnonzero(mask).tolist():
+        results[index] = rules.match_patterns(torrents[index])
+    return results
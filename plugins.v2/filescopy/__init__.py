@@ -1,31 +1,43 @@
 import datetime
-import random
+import os
+import re
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Optional
 
 import pytz
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
 
 from app.core.config import settings
 from app.log import logger
 from app.plugins import _PluginBase
 from app.utils.system import SystemUtils
+from .copier import CopyEngine, METHOD_NAMES, is_same_file
+from .destination import DestinationIndex
+from .filters import FileFilter
+from .manifest import ScanManifest
+from .monitor import FileMonitorHandler, StableFileQueue
+from .workers import COPIED, FAILED, SKIPPED, CopyStats, DestinationLimiter, DestinationRule
 
 lock = threading.Lock()
+# 等待中的监控目录任务
+queue_lock = threading.Lock()
 
 
 class FilesCopy(_PluginBase):
     # 插件名称
     plugin_name = "文件复制(修改)"
     # 插件描述
-    plugin_desc = "自定义文件类型从源目录复制到目的目录。(排除.!qB文件)"
+    plugin_desc = "自定义文件类型从源目录复制到目的目录。(排除未完成下载的文件)"
     # 插件图标
     plugin_icon = "https://raw.githubusercontent.com/thsrite/MoviePilot-Plugins/main/icons/copy_files.png"
     # 插件版本
-    plugin_version = "2.0"
+    plugin_version = "3.1"
     # 插件作者
     plugin_author = "thsrite,dongjiqiang"
     # 作者主页
@@ -42,12 +54,38 @@ class FilesCopy(_PluginBase):
     _enabled = False
     _onlyonce = False
     _cron = None
-    _delay = None
     _monitor_dirs = ""
     # 存储源目录与目的目录关系
     _dirconf: Dict[str, Path] = {}
+    # 存储源目录的定时周期
+    _dircron: Dict[str, str] = {}
+    # 等待运行的监控目录 -> 是否全量
+    _queued: Dict[str, bool] = {}
+    # 定时全量复制间隔（小时），0为每次定时运行都全量复制
+    _full_interval = 24
+    # 监控目录 -> 上次全量复制完成时间
+    _last_full: Dict[str, float] = {}
 
     _rmt_mediaext = None
+    # 排除规则
+    _excludes = None
+    _file_filter: Optional[FileFilter] = None
+    # 实时监控
+    _realtime = False
+    # 监控模式 fast/compatibility
+    _mode = "fast"
+    _observers = []
+    # 等待文件写入完成的队列
+    _stable_queue: Optional[StableFileQueue] = None
+    # 复制线程数
+    _threads = 4
+    # 目的目录并发数配置
+    _dest_limits = ""
+    # 复制模式 copy/hardlink
+    _link_mode = "copy"
+    _limiter: Optional[DestinationLimiter] = None
+    # 复制引擎
+    _engine = CopyEngine()
 
     # 退出事件
     _event = threading.Event()
@@ -55,6 +93,7 @@ class FilesCopy(_PluginBase):
     def init_plugin(self, config: dict = None):
         # 清空配置
         self._dirconf = {}
+        self._dircron = {}
 
         # 读取配置
         if config:
@@ -62,12 +101,25 @@ class FilesCopy(_PluginBase):
             self._onlyonce = config.get("onlyonce")
             self._monitor_dirs = config.get("monitor_dirs") or ""
             self._cron = config.get("cron")
-            self._delay = config.get("delay")
             self._rmt_mediaext = config.get("rmt_mediaext") or ".nfo, .jpg"
+            self._excludes = config.get("excludes") if config.get("excludes") is not None \
+                else ".!qB, .part, .aria2"
+            self._realtime = config.get("realtime")
+            self._mode = config.get("mode") or "fast"
+            self._threads = self.__parse_int(config.get("threads"), 4)
+            self._dest_limits = config.get("dest_limits") or ""
+            self._link_mode = config.get("link_mode") or "copy"
+            self._full_interval = self.__parse_hours(config.get("full_interval"), 24)
 
         # 停止现有任务
         self.stop_service()
 
+        # 文件过滤规则
+        self._file_filter = FileFilter(extensions=self._rmt_mediaext or ".nfo, .jpg", excludes=self._excludes or "")
+
+        # 目的目录并发限制
+        self._limiter = DestinationLimiter(default=self._threads, rules=self.__parse_dest_limits(), event=self._event)
+
         if self._enabled or self._onlyonce:
             # 定时服务管理器
             self._scheduler = BackgroundScheduler(timezone=settings.TZ)
@@ -77,9 +129,10 @@ class FilesCopy(_PluginBase):
             if not monitor_dirs:
                 return
             for mon_path in monitor_dirs:
-                # 格式源目录:目的目录
+                # 格式源目录:目的目录#定时周期
                 if not mon_path:
                     continue
+                mon_path, cron = self.__split_cron(mon_path)
 
                 # 存储目的目录
                 if SystemUtils.is_windows():
@@ -99,18 +152,32 @@ class FilesCopy(_PluginBase):
                 else:
                     self._dirconf[mon_path] = None
 
-                # 启用目录监控
+                # 单独的定时周期
+                if cron:
+                    self._dircron[mon_path] = cron
+
+                # 启用目录监控，只扫描该监控目录
                 if self._enabled:
                     self._scheduler.add_job(func=self.copy_files, trigger='date',
                                             run_date=datetime.datetime.now(
                                                 tz=pytz.timezone(settings.TZ)) + datetime.timedelta(seconds=3),
-                                            name=f"文件复制 {mon_path}")
+                                            name=f"文件复制 {mon_path}",
+                                            kwargs={"mon_path": mon_path})
+            # 实时监控
+            if self._enabled and self._realtime:
+                self._stable_queue = StableFileQueue(handler=self.__copy_stable_file)
+                self._stable_queue.start()
+                for mon_path, target_path in self._dirconf.items():
+                    if target_path:
+                        self.__start_monitor(mon_path)
+
             # 运行一次定时服务
             if self._onlyonce:
-                logger.info("文件复制服务启动，立即运行一次")
+                logger.info("文件复制服务启动，立即全量运行一次")
                 self._scheduler.add_job(name="文件复制", func=self.copy_files, trigger='date',
                                         run_date=datetime.datetime.now(
-                                            tz=pytz.timezone(settings.TZ)) + datetime.timedelta(seconds=3)
+                                            tz=pytz.timezone(settings.TZ)) + datetime.timedelta(seconds=3),
+                                        kwargs={"full": True}
                                         )
                 # 关闭一次性开关
                 self._onlyonce = False
@@ -122,45 +189,246 @@ class FilesCopy(_PluginBase):
                 self._scheduler.print_jobs()
                 self._scheduler.start()
 
-    def copy_files(self):
+    def scheduled_copy(self, mon_path: str):
+        """
+        定时任务，距上次全量复制超过间隔时全量复制，
+        修复增量扫描发现不了的变化，如目的文件被删除、源文件原地修改但所在目录修改时间未变化
+        开启实时监控时每次都全量复制，补充处理实时监控遗漏或停止时丢弃的文件
+        """
+        full = self._realtime \
+            or time.time() - self._last_full.get(mon_path, 0) >= self._full_interval * 3600
+        self.copy_files(full=full, mon_path=mon_path)
+
+    def copy_files(self, full: bool = False, mon_path: Optional[str] = None):
         """
         定时任务，复制文件
+        :param full: 全量复制，否则只处理扫描清单中新增或变化的文件
+        :param mon_path: 只复制该监控目录，为空时复制所有监控目录
         """
-        logger.info("开始全量复制监控目录 ...")
-        # 遍历所有监控目录
-        for mon_path in self._dirconf.keys():
-            target_path = self._dirconf[mon_path]
-            # 遍历目录下所有文件
-            files = SystemUtils.list_files(Path(mon_path), [ext.strip() for ext in self._rmt_mediaext.split(",")])
-            # 排除.!qB文件
-            filtered_files = [file for file in files if not file.endswith(".!qB")]
-            cnt = 0
-            for file in filtered_files:
-                logger.info(f"开始处理本地文件：{file}")
-                cloud_file = str(file).replace(mon_path, str(target_path))
-                if Path(cloud_file).exists():
-                    logger.info(f"{cloud_file} 文件已存在，跳过")
-                    continue
-                state, error = SystemUtils.copy(file, Path(cloud_file))
-                logger.info(f"{file} -> {cloud_file} {'成功' if state == 0 else '失败'} {error}")
-
-                # 随机延时
-                if self._delay:
-                    cnt += 1
-                    delays = self._delay.split(",")
-                    if cnt >= int(delays[0]):
-                        if str(delays[1]).count("-") == 1:
-                            wait_time = random.randint(int(str(delays[1]).split("-")[0]),
-                                                       int(str(delays[1]).split("-")[1]))
-                            logger.info(f"随机延迟 {wait_time} 秒")
-                            time.sleep(wait_time)
-                        else:
-                            delay = int(delays[1])
-                            logger.info(f"延迟 {delay} 秒")
-                            time.sleep(delay)
-                        cnt = 0
-
-        logger.info("全量复制监控目录完成！")
+        mon_paths = [mon_path] if mon_path else list(self._dirconf.keys())
+        for path in mon_paths:
+            if not self.__copy_mapping(mon_path=path, full=full):
+                logger.info("文件复制服务停止")
+                return
+
+    def __copy_mapping(self, mon_path: str, full: bool) -> bool:
+        """
+        复制单个监控目录，同一时间只运行一个监控目录
+        同一监控目录已有等待中的任务时合并到该任务，运行中的任务结束后最多再运行一次，服务停止时返回False
+        """
+        with queue_lock:
+            if mon_path in self._queued:
+                self._queued[mon_path] = self._queued[mon_path] or full
+                logger.info(f"{mon_path} 已有等待中的复制任务，合并本次运行")
+                return True
+            self._queued[mon_path] = full
+        # 扫描清单同一时间只允许一个任务使用
+        with lock:
+            with queue_lock:
+                full = self._queued.pop(mon_path, full)
+            if self._event.is_set():
+                return False
+            logger.info(f"开始{'全量' if full else '增量'}复制监控目录 {mon_path} ...")
+            stats = CopyStats()
+            manifest = ScanManifest(self.get_data_path() / "manifest.db")
+            try:
+                if not self.__copy_dir(manifest=manifest, mon_path=mon_path,
+                                       target_path=self._dirconf.get(mon_path), full=full, stats=stats):
+                    logger.info(f"{mon_path} 复制停止，{stats.summary()}")
+                    return False
+                manifest.commit()
+                if full:
+                    self._last_full[mon_path] = time.time()
+            finally:
+                manifest.close()
+        logger.info(f"{mon_path} {'全量' if full else '增量'}复制完成！{stats.summary()}")
+        return True
+
+    def __copy_dir(self, manifest: ScanManifest, mon_path: str, target_path: Path, full: bool,
+                   stats: CopyStats) -> bool:
+        """
+        复制单个监控目录，服务停止时返回False
+        扫描到的文件交给线程池复制，等待中的任务数有上限，避免扫描大目录时积压
+        目的文件是否存在通过目的目录索引判断，每个目的目录只列出一次
+        """
+        if not target_path:
+            logger.warn(f"{mon_path} 未配置目的目录，跳过")
+            return True
+        # 清单标识，包含过滤规则指纹，修改文件格式或排除规则后重新列出所有目录
+        root = f"{mon_path}:{target_path}#{self._file_filter.fingerprint}"
+        manifest.retain(prefix=f"{mon_path}:{target_path}", root=root)
+        index = DestinationIndex()
+        # 该目的目录同时复制的文件数
+        workers = min(self._limiter.concurrency(target_path), self._threads)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="FilesCopy") as executor:
+            futures = set()
+            # 遍历目录下新增或变化的文件
+            for file, size, mtime_ns in manifest.scan(root=root, directory=mon_path,
+                                                      file_filter=self._file_filter, full=full):
+                if self._event.is_set():
+                    break
+                futures.add(executor.submit(self.__copy_task, manifest, root, file, size, mtime_ns,
+                                            mon_path, target_path, stats, index))
+                if len(futures) >= workers * 2:
+                    _, futures = wait(futures, return_when=FIRST_COMPLETED)
+        return not self._event.is_set()
+
+    def __copy_task(self, manifest: ScanManifest, root: str, file: str, size: int, mtime_ns: int,
+                    mon_path: str, target_path: Path, stats: CopyStats, index: DestinationIndex):
+        """
+        复制线程任务，单个文件失败不影响其它文件
+        """
+        if self._event.is_set():
+            return
+        try:
+            with self._limiter.slot(target_path):
+                status, method = self.__copy_file(file=file, mon_path=mon_path, target_path=target_path,
+                                                  index=index)
+        except Exception as e:
+            logger.error(f"{file} 复制失败：{str(e)}")
+            status, method = FAILED, None
+        stats.add(status, size, method)
+        if status == FAILED:
+            manifest.mark_failed(root, file)
+        else:
+            manifest.mark_done(root, file, size, mtime_ns)
+
+    def __copy_file(self, file: str, mon_path: str, target_path: Path,
+                    index: Optional[DestinationIndex] = None) -> Tuple[str, Optional[str]]:
+        """
+        复制单个文件，目的文件已存在且大小和修改时间一致时跳过，返回处理结果和使用的复制方式
+        :param index: 目的目录索引，未传入时直接检查目的文件
+        """
+        logger.info(f"开始处理本地文件：{file}")
+        cloud_file = file.replace(mon_path, str(target_path))
+        if index.exists(cloud_file) if index else Path(cloud_file).exists():
+            if is_same_file(os.stat(file), os.stat(cloud_file)):
+                logger.info(f"{cloud_file} 文件已存在，跳过")
+                return SKIPPED, None
+            logger.info(f"{cloud_file} 与源文件大小或修改时间不一致，重新复制")
+        try:
+            # 实时复制时没有目的目录索引，直接创建目录
+            if index:
+                index.ensure_dir(os.path.dirname(cloud_file))
+            else:
+                os.makedirs(os.path.dirname(cloud_file), exist_ok=True)
+            method = self._engine.copy(file, cloud_file, throttle=self._limiter.throttle(target_path),
+                                       hardlink=self._link_mode == "hardlink")
+        except OSError as e:
+            logger.info(f"{file} -> {cloud_file} 失败 {str(e)}")
+            return FAILED, None
+        logger.info(f"{file} -> {cloud_file} 成功（{METHOD_NAMES.get(method, method)}）")
+        if index:
+            index.add(cloud_file)
+        return COPIED, method
+
+    @staticmethod
+    def __split_cron(line: str) -> Tuple[str, Optional[str]]:
+        """
+        拆分目录配置末尾的 #定时周期，#后不是5段的cron表达式时视为路径的一部分，如 #recycle、Show #1
+        """
+        path, sep, cron = line.strip().rpartition("#")
+        cron = cron.strip()
+        if not sep or len(cron.split()) != 5:
+            return line.strip(), None
+        try:
+            CronTrigger.from_crontab(cron)
+        except ValueError as e:
+            logger.warn(f"{line.strip()} 定时周期 {cron} 格式错误，按目录路径处理：{str(e)}")
+            return line.strip(), None
+        return path.strip(), cron
+
+    @staticmethod
+    def __parse_hours(value: Any, default: int) -> float:
+        """
+        解析小时数配置，允许为0
+        """
+        try:
+            return max(float(value), 0)
+        except (TypeError, ValueError):
+            return default
+
+    @staticmethod
+    def __parse_int(value: Any, default: int) -> int:
+        """
+        解析正整数配置
+        """
+        try:
+            return max(int(value), 1)
+        except (TypeError, ValueError):
+            return default
+
+    def __parse_dest_limits(self) -> Dict[str, DestinationRule]:
+        """
+        解析目的目录限制配置，每行 目的目录:并发数[:带宽MB/s[:文件数/s]]，0为不限制
+        """
+        rules = {}
+        for line in self._dest_limits.split("\n"):
+            line = line.strip()
+            if not line:
+                continue
+            matched = re.match(r"^(.+?):(\d+)(?::(\d+(?:\.\d+)?))?(?::(\d+(?:\.\d+)?))?$", line)
+            if not matched:
+                logger.warn(f"目的目录限制配置格式错误：{line}")
+                continue
+            path, concurrency, bandwidth, file_rate = matched.groups()
+            rules[path.strip()] = DestinationRule(concurrency=int(concurrency),
+                                                  bandwidth=float(bandwidth or 0) * 1024 * 1024,
+                                                  file_rate=float(file_rate or 0))
+        return rules
+
+    def __start_monitor(self, mon_path: str):
+        """
+        启动目录实时监控
+        """
+        try:
+            if self._mode == "compatibility":
+                # 兼容模式，目录同步性能降低且NAS不能休眠，但可以兼容挂载的远程共享目录如SMB
+                observer = PollingObserver(timeout=10)
+            else:
+                # 内部处理系统操作类型选择最优解
+                observer = Observer(timeout=10)
+            observer.schedule(FileMonitorHandler(mon_path=mon_path, callback=self.__on_file_event),
+                              path=mon_path, recursive=True)
+            observer.daemon = True
+            observer.start()
+            self._observers.append(observer)
+            logger.info(f"{mon_path} 的文件复制实时监控服务启动")
+        except Exception as e:
+            err_msg = str(e)
+            if "inotify" in err_msg and "reached" in err_msg:
+                logger.warn(f"文件复制实时监控服务启动出现异常：{err_msg}，请在宿主机上（不是docker容器内）执行以下命令并重启："
+                            + """
+                                 echo fs.inotify.max_user_watches=524288 | sudo tee -a /etc/sysctl.conf
+                                 echo fs.inotify.max_user_instances=524288 | sudo tee -a /etc/sysctl.conf
+                                 sudo sysctl -p
+                                 """)
+            else:
+                logger.error(f"{mon_path} 启动文件复制实时监控失败：{err_msg}")
+
+    def __on_file_event(self, mon_path: str, file: str):
+        """
+        文件变化事件，符合文件格式的加入等待队列
+        """
+        if not self._file_filter.match(os.path.basename(file)) \
+                or any(self._file_filter.is_excluded(name)
+                       for name in os.path.relpath(os.path.dirname(file), mon_path).split(os.sep)):
+            return
+        if self._stable_queue:
+            self._stable_queue.add(mon_path, file)
+
+    def __copy_stable_file(self, mon_path: str, file: str):
+        """
+        复制已写入完成的文件
+        """
+        target_path = self._dirconf.get(mon_path)
+        if not target_path or self._event.is_set():
+            return
+        try:
+            with self._limiter.slot(target_path):
+                self.__copy_file(file=file, mon_path=mon_path, target_path=target_path)
+        except Exception as e:
+            logger.error(f"{file} 复制失败：{str(e)}")
 
     def __update_config(self):
         """
@@ -171,8 +439,14 @@ class FilesCopy(_PluginBase):
             "onlyonce": self._onlyonce,
             "monitor_dirs": self._monitor_dirs,
             "cron": self._cron,
-            "delay": self._delay,
-            "rmt_mediaext": self._rmt_mediaext
+            "rmt_mediaext": self._rmt_mediaext,
+            "excludes": self._excludes,
+            "realtime": self._realtime,
+            "mode": self._mode,
+            "threads": self._threads,
+            "dest_limits": self._dest_limits,
+            "link_mode": self._link_mode,
+            "full_interval": self._full_interval
         })
 
     def get_state(self) -> bool:
@@ -196,15 +470,22 @@ class FilesCopy(_PluginBase):
             "kwargs": {} # 定时器参数
         }]
         """
-        if self._enabled and self._cron:
-            return [{
-                "id": "FileCopy",
-                "name": "文件复制",
-                "trigger": CronTrigger.from_crontab(self._cron),
-                "func": self.copy_files,
-                "kwargs": {}
-            }]
-        return []
+        if not self._enabled:
+            return []
+        services = []
+        # 每个监控目录单独定时，未配置定时周期的使用默认周期
+        for mon_path, target_path in self._dirconf.items():
+            cron = self._dircron.get(mon_path) or self._cron
+            if not target_path or not cron:
+                continue
+            services.append({
+                "id": f"FileCopy|{mon_path}",
+                "name": f"文件复制 {mon_path}",
+                "trigger": CronTrigger.from_crontab(cron),
+                "func": self.scheduled_copy,
+                "kwargs": {"mon_path": mon_path}
+            })
+        return services
 
     def get_form(self) -> Tuple[List[dict], Dict[str, Any]]:
         return [
@@ -246,6 +527,22 @@ class FilesCopy(_PluginBase):
                                     }
                                 ]
                             },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 4
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSwitch',
+                                        'props': {
+                                            'model': 'realtime',
+                                            'label': '实时监控',
+                                        }
+                                    }
+                                ]
+                            },
                         ]
                     },
                     {
@@ -262,7 +559,7 @@ class FilesCopy(_PluginBase):
                                         'component': 'VTextField',
                                         'props': {
                                             'model': 'cron',
-                                            'label': '定时全量同步周期',
+                                            'label': '定时增量同步周期',
                                             'placeholder': '5位cron表达式，留空关闭'
                                         }
                                     }
@@ -278,9 +575,29 @@ class FilesCopy(_PluginBase):
                                     {
                                         'component': 'VTextField',
                                         'props': {
-                                            'model': 'delay',
-                                            'label': '随机延时',
-                                            'placeholder': '20,1-10  处理10个文件后随机延迟1-10秒'
+                                            'model': 'threads',
+                                            'label': '复制线程数',
+                                            'placeholder': '4'
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 4
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSelect',
+                                        'props': {
+                                            'model': 'mode',
+                                            'label': '监控模式',
+                                            'items': [
+                                                {'title': '性能模式', 'value': 'fast'},
+                                                {'title': '兼容模式', 'value': 'compatibility'}
+                                            ]
                                         }
                                     }
                                 ]
@@ -302,7 +619,8 @@ class FilesCopy(_PluginBase):
                                             'model': 'monitor_dirs',
                                             'label': '监控目录',
                                             'rows': 5,
-                                            'placeholder': '监控目录:转移目的目录'
+                                            'placeholder': '监控目录:转移目的目录#定时周期\n'
+                                                           '定时周期为可选的5位cron表达式，未填写时使用定时增量同步周期'
                                         }
                                     }
                                 ]
@@ -331,6 +649,89 @@ class FilesCopy(_PluginBase):
                             }
                         ]
                     },
+                    {
+                        'component': 'VRow',
+                        'content': [
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextarea',
+                                        'props': {
+                                            'model': 'excludes',
+                                            'label': '排除规则',
+                                            'rows': 2,
+                                            'placeholder': '.!qB, .part, .aria2  支持通配符，同时排除同名目录，如 @eaDir'
+                                        }
+                                    }
+                                ]
+                            }
+                        ]
+                    },
+                    {
+                        'component': 'VRow',
+                        'content': [
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 3
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSelect',
+                                        'props': {
+                                            'model': 'link_mode',
+                                            'label': '复制模式',
+                                            'items': [
+                                                {'title': '复制', 'value': 'copy'},
+                                                {'title': '同一文件系统时硬链接', 'value': 'hardlink'}
+                                            ]
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 3
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'full_interval',
+                                            'label': '全量复制间隔（小时）',
+                                            'placeholder': '24，定时任务超过间隔时全量复制，0或开启实时监控时每次都全量'
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 6
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextarea',
+                                        'props': {
+                                            'model': 'dest_limits',
+                                            'label': '目的目录限制',
+                                            'rows': 2,
+                                            'placeholder': '目的目录:并发数[:带宽MB/s[:文件数/s]]，每行一个，0为不限制，'
+                                                           '如网盘挂载目录 /mnt/cloud:2:20:5，未配置的目录使用复制线程数且不限速'
+                                        }
+                                    }
+                                ]
+                            }
+                        ]
+                    },
                 ]
             }
         ], {
@@ -338,8 +739,14 @@ class FilesCopy(_PluginBase):
             "onlyonce": False,
             "monitor_dirs": "",
             "cron": "",
-            "delay": "20,1-10",
-            "rmt_mediaext": ".nfo, .jpg"
+            "rmt_mediaext": ".nfo, .jpg",
+            "excludes": ".!qB, .part, .aria2",
+            "realtime": False,
+            "mode": "fast",
+            "threads": 4,
+            "dest_limits": "",
+            "link_mode": "copy",
+            "full_interval": 24
         }
 
     def get_page(self) -> List[dict]:
@@ -349,6 +756,17 @@ class FilesCopy(_PluginBase):
         """
         退出插件
         """
+        if self._observers:
+            for observer in self._observers:
+                try:
+                    observer.stop()
+                    observer.join()
+                except Exception as e:
+                    logger.error(f"停止实时监控失败：{str(e)}")
+            self._observers = []
+        if self._stable_queue:
+            self._stable_queue.stop()
+            self._stable_queue = None
         if self._scheduler:
             self._scheduler.remove_all_jobs()
             if self._scheduler.running:
@@ -0,0 +1,328 @@
+import errno
+import hashlib
+import json
+import os
+import shutil
+import threading
+from typing import Callable, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# 复制方式，按开销从低到高排列
+HARDLINK = "hardlink"
+REFLINK = "reflink"
+COPY_FILE_RANGE = "copy_file_range"
+SENDFILE = "sendfile"
+STREAM = "stream"
+
+METHOD_NAMES = {
+    HARDLINK: "硬链接",
+    REFLINK: "写时复制",
+    COPY_FILE_RANGE: "内核复制",
+    SENDFILE: "sendfile",
+    STREAM: "流式复制"
+}
+
+# 不占用额外空间的复制方式
+LINK_METHODS = {HARDLINK, REFLINK}
+
+# linux/fs.h FICLONE
+FICLONE = 0x40049409
+
+# 表示当前文件系统不支持该复制方式的错误
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTTY,
+                      errno.EBADF, errno.EPERM, errno.ENOTSUP}
+# 无法创建硬链接时改为复制的错误
+LINK_ERRNOS = UNSUPPORTED_ERRNOS | {errno.EMLINK, errno.EACCES}
+
+# 复制中的临时文件后缀
+TEMP_SUFFIX = ".fctmp"
+# 断点记录文件后缀
+CHECKPOINT_SUFFIX = ".fctmp.json"
+
+
+def temp_path(dst: str) -> str:
+    """
+    目的文件复制过程中使用的临时文件
+    """
+    directory, name = os.path.split(dst)
+    return os.path.join(directory, f".{name}{TEMP_SUFFIX}")
+
+
+def is_same_file(src_stat: os.stat_result, dst_stat: os.stat_result) -> bool:
+    """
+    目的文件与源文件大小一致且不早于源文件修改时间，视为已复制
+    网络挂载目录的修改时间可能只精确到秒，允许1秒误差
+    """
+    return src_stat.st_size == dst_stat.st_size \
+        and dst_stat.st_mtime_ns >= src_stat.st_mtime_ns - 1_000_000_000
+
+
+class CopyEngine:
+    """
+    文件复制引擎
+    先写入临时文件，完成后重命名为目的文件，中断时不会留下不完整的目的文件。
+    依次尝试写时复制（FICLONE）、copy_file_range、sendfile，都不支持时使用大缓冲区流式复制，
+    按源和目的设备记录不支持的方式，后续文件不再尝试。
+    大文件分块复制，每块写入后记录源数据的哈希，再次复制时校验最后记录的块后从断点继续
+    """
+
+    # 单次内核复制的最大字节数
+    _kernel_size = 1024 * 1024 * 1024
+    # 超过该大小的文件分块复制并记录断点
+    _resume_size = 256 * 1024 * 1024
+    # 断点续传的分块大小
+    _chunk_size = 64 * 1024 * 1024
+
+    def __init__(self, buffer_size: int = 8 * 1024 * 1024):
+        # 流式复制缓冲区大小
+        self._buffer_size = buffer_size
+        # (源设备, 目的设备, 复制方式)
+        self._unsupported: Set[Tuple[int, int, str]] = set()
+        self._lock = threading.Lock()
+
+    def copy(self, src: str, dst: str, throttle: Optional[Callable[[int], None]] = None,
+             hardlink: bool = False) -> str:
+        """
+        复制文件内容和属性，返回使用的复制方式，失败时抛出OSError
+        :param throttle: 限速函数，每次写入前传入本次写入的字节数，按缓冲区大小分段写入
+        :param hardlink: 源和目的在同一文件系统时优先创建硬链接，跨文件系统时复制
+        """
+        tmp = temp_path(dst)
+        checkpoint = tmp[:-len(TEMP_SUFFIX)] + CHECKPOINT_SUFFIX
+        if hardlink and self.__hardlink(src, dst, tmp):
+            self.__remove(checkpoint)
+            return HARDLINK
+        with open(src, "rb") as fsrc:
+            src_stat = os.fstat(fsrc.fileno())
+            resumable = src_stat.st_size >= self._resume_size
+            hashes = self.__load_checkpoint(checkpoint, src_stat) if resumable else []
+            try:
+                with open(tmp, "r+b" if hashes and os.path.exists(tmp) else "wb") as fdst:
+                    method = self.__copy_data(fsrc, fdst, src_stat, hashes, checkpoint if resumable else None,
+                                              throttle)
+            except BaseException:
+                # 可续传的文件保留临时文件和断点记录，下次继续
+                if not resumable:
+                    self.__remove(tmp)
+                raise
+        try:
+            shutil.copystat(src, tmp)
+        except OSError:
+            # 部分网络挂载目录不支持修改属性
+            pass
+        os.replace(tmp, dst)
+        if resumable:
+            self.__remove(checkpoint)
+        return method
+
+    def __copy_data(self, fsrc, fdst, src_stat: os.stat_result, hashes: List[str],
+                    checkpoint: Optional[str], throttle: Optional[Callable[[int], None]]) -> str:
+        """
+        复制文件数据，传入断点记录文件时分块复制
+        """
+        devices = (src_stat.st_dev, os.fstat(fdst.fileno()).st_dev)
+        size = src_stat.st_size
+        offset = self.__verify(fsrc, fdst, hashes)
+        fdst.truncate(offset)
+        if not offset and self.__reflink(fsrc, fdst, devices):
+            return REFLINK
+        method = STREAM
+        chunk_size = self._chunk_size if checkpoint else max(size, 1)
+        while offset < size:
+            length = min(chunk_size, size - offset)
+            method = self.__copy_range(fsrc, fdst, offset, length, devices, throttle)
+            if checkpoint:
+                fdst.flush()
+                os.fsync(fdst.fileno())
+                hashes.append(self.__hash_range(fsrc, offset, length))
+                self.__save_checkpoint(checkpoint, src_stat, hashes)
+            offset += length
+        return method
+
+    def __verify(self, fsrc, fdst, hashes: List[str]) -> int:
+        """
+        校验已复制的块，返回可继续复制的位置
+        之前的块在记录前已落盘，只需从最后一块往前校验到第一个一致的块
+        """
+        tmp_size = os.fstat(fdst.fileno()).st_size
+        src_size = os.fstat(fsrc.fileno()).st_size
+        del hashes[tmp_size // self._chunk_size:]
+        while hashes:
+            offset = (len(hashes) - 1) * self._chunk_size
+            length = min(self._chunk_size, src_size - offset)
+            if self.__hash_range(fdst, offset, length) == hashes[-1]:
+                return len(hashes) * self._chunk_size
+            hashes.pop()
+        return 0
+
+    def __copy_range(self, fsrc, fdst, offset: int, length: int, devices: Tuple[int, int],
+                     throttle: Optional[Callable[[int], None]]) -> str:
+        """
+        复制指定范围的数据，返回使用的复制方式
+        按位置写入，某种方式失败时可用下一种方式重新复制该范围
+        """
+        for name, func in ((COPY_FILE_RANGE, self.__copy_file_range),
+                           (SENDFILE, self.__sendfile)):
+            if self.__is_unsupported(devices, name):
+                continue
+            try:
+                func(fsrc, fdst, offset, length, throttle)
+                return name
+            except OSError as e:
+                if e.errno not in UNSUPPORTED_ERRNOS:
+                    raise
+                with self._lock:
+                    self._unsupported.add((*devices, name))
+        self.__stream(fsrc, fdst, offset, length, throttle)
+        return STREAM
+
+    def __hardlink(self, src: str, dst: str, tmp: str) -> bool:
+        """
+        创建硬链接，先链接到临时文件再替换目的文件，源和目的不在同一设备时返回False
+        """
+        devices = (os.stat(src).st_dev, os.stat(os.path.dirname(dst)).st_dev)
+        if devices[0] != devices[1] or self.__is_unsupported(devices, HARDLINK):
+            return False
+        self.__remove(tmp)
+        try:
+            os.link(src, tmp)
+        except OSError as e:
+            if e.errno not in LINK_ERRNOS:
+                raise
+            with self._lock:
+                self._unsupported.add((*devices, HARDLINK))
+            return False
+        os.replace(tmp, dst)
+        return True
+
+    def __is_unsupported(self, devices: Tuple[int, int], name: str) -> bool:
+        with self._lock:
+            return (*devices, name) in self._unsupported
+
+    def __reflink(self, fsrc, fdst, devices: Tuple[int, int]) -> bool:
+        """
+        写时复制，仅btrfs、XFS等文件系统的同一设备内支持
+        """
+        if not fcntl or self.__is_unsupported(devices, REFLINK):
+            return False
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return True
+        except OSError as e:
+            if e.errno not in UNSUPPORTED_ERRNOS:
+                raise
+            with self._lock:
+                self._unsupported.add((*devices, REFLINK))
+            return False
+
+    def __copy_file_range(self, fsrc, fdst, offset: int, length: int, throttle: Optional[Callable[[int], None]]):
+        """
+        内核内复制，不经过用户空间
+        """
+        if not hasattr(os, "copy_file_range"):
+            raise OSError(errno.ENOSYS, "不支持copy_file_range")
+        self.__kernel_copy(lambda pos, count: os.copy_file_range(fsrc.fileno(), fdst.fileno(), count, pos, pos),
+                           offset, length, throttle)
+
+    def __sendfile(self, fsrc, fdst, offset: int, length: int, throttle: Optional[Callable[[int], None]]):
+        """
+        sendfile复制，目的为普通文件需要Linux 2.6.33以上
+        """
+        if not hasattr(os, "sendfile"):
+            raise OSError(errno.ENOSYS, "不支持sendfile")
+        os.lseek(fdst.fileno(), offset, os.SEEK_SET)
+        self.__kernel_copy(lambda pos, count: os.sendfile(fdst.fileno(), fsrc.fileno(), pos, count),
+                           offset, length, throttle)
+
+    def __kernel_copy(self, func, offset: int, length: int, throttle: Optional[Callable[[int], None]]):
+        """
+        循环调用内核复制直到复制完指定长度
+        """
+        copied = 0
+        piece_size = self._buffer_size if throttle else self._kernel_size
+        while copied < length:
+            piece = min(piece_size, length - copied)
+            if throttle:
+                throttle(piece)
+            count = func(offset + copied, piece)
+            if count == 0:
+                break
+            copied += count
+        if copied == 0 and length:
+            # 部分虚拟文件系统不报错但不复制数据
+            raise OSError(errno.ENOSYS, "未复制任何数据")
+        if copied < length:
+            raise OSError(errno.EIO, f"复制不完整：{copied}/{length}")
+
+    def __stream(self, fsrc, fdst, offset: int, length: int, throttle: Optional[Callable[[int], None]]):
+        """
+        大缓冲区流式复制
+        """
+        fsrc.seek(offset)
+        fdst.seek(offset)
+        remaining = length
+        while remaining:
+            piece = min(self._buffer_size, remaining)
+            if throttle:
+                throttle(piece)
+            data = fsrc.read(piece)
+            if not data:
+                raise OSError(errno.EIO, f"复制不完整：{length - remaining}/{length}")
+            fdst.write(data)
+            remaining -= len(data)
+        fdst.flush()
+
+    def __hash_range(self, file, offset: int, length: int) -> str:
+        """
+        计算指定范围数据的哈希
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        file.seek(offset)
+        remaining = length
+        while remaining:
+            data = file.read(min(self._buffer_size, remaining))
+            if not data:
+                break
+            digest.update(data)
+            remaining -= len(data)
+        return digest.hexdigest()
+
+    @staticmethod
+    def __load_checkpoint(checkpoint: str, src_stat: os.stat_result) -> List[str]:
+        """
+        读取断点记录，源文件已变化时忽略
+        """
+        try:
+            with open(checkpoint, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return []
+        if data.get("size") != src_stat.st_size or data.get("mtime_ns") != src_stat.st_mtime_ns \
+                or data.get("chunk_size") != CopyEngine._chunk_size:
+            return []
+        return list(data.get("hashes") or [])
+
+    @staticmethod
+    def __save_checkpoint(checkpoint: str, src_stat: os.stat_result, hashes: List[str]):
+        """
+        保存断点记录，先写临时文件再替换，避免记录文件不完整
+        """
+        with open(checkpoint + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "size": src_stat.st_size,
+                "mtime_ns": src_stat.st_mtime_ns,
+                "chunk_size": CopyEngine._chunk_size,
+                "hashes": hashes
+            }, f)
+        os.replace(checkpoint + ".tmp", checkpoint)
+
+    @staticmethod
+    def __remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
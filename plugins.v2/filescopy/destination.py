@@ -0,0 +1,61 @@
+import os
+import threading
+from typing import Dict, Optional, Set
+
+
+class DestinationIndex:
+    """
+    目的目录文件索引
+    每个目的目录只列出一次，文件是否存在从内存中判断，已确认存在的目录不再重复创建
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 目录 -> 目录下的文件名，目录不存在时为None
+        self._dirs: Dict[str, Optional[Set[str]]] = {}
+
+    def exists(self, path: str) -> bool:
+        """
+        目的文件是否存在
+        """
+        directory, name = os.path.split(path)
+        names = self.__list(directory)
+        return names is not None and name in names
+
+    def ensure_dir(self, directory: str):
+        """
+        创建目的目录，已存在或已创建过的目录直接返回
+        """
+        if self.__list(directory) is not None:
+            return
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            if self._dirs.get(directory) is None:
+                self._dirs[directory] = set()
+
+    def add(self, path: str):
+        """
+        记录新复制的文件
+        """
+        directory, name = os.path.split(path)
+        with self._lock:
+            names = self._dirs.get(directory)
+            if names is None:
+                names = self._dirs[directory] = set()
+            names.add(name)
+
+    def __list(self, directory: str) -> Optional[Set[str]]:
+        """
+        列出目录下的文件名，每个目录只列出一次
+        """
+        with self._lock:
+            if directory in self._dirs:
+                return self._dirs[directory]
+        try:
+            with os.scandir(directory) as entries:
+                names = {entry.name for entry in entries}
+        except (FileNotFoundError, NotADirectoryError):
+            names = None
+        with self._lock:
+            # 其它线程已列出或已写入时以其为准
+            return self._dirs.setdefault(directory, names)
@@ -0,0 +1,46 @@
+import fnmatch
+import hashlib
+import os
+import re
+from typing import FrozenSet, Optional, Pattern, Tuple
+
+
+def _split(text: str) -> Tuple[str, ...]:
+    """
+    拆分逗号或换行分隔的配置
+    """
+    return tuple(item.strip() for item in re.split(r"[,\n]", text or "") if item.strip())
+
+
+class FileFilter:
+    """
+    预编译的文件过滤规则
+    文件格式按后缀集合匹配，排除规则支持通配符，不含通配符的规则按后缀匹配，排除规则同时作用于目录名
+    """
+
+    def __init__(self, extensions: str, excludes: str = ""):
+        suffixes = {ext.lower() if ext.startswith(".") else f".{ext.lower()}" for ext in _split(extensions)}
+        # 单个后缀用集合查找，.zh.ass这类多段后缀用endswith匹配
+        self._extensions: FrozenSet[str] = frozenset(ext for ext in suffixes if ext.count(".") == 1)
+        self._multi_extensions: Tuple[str, ...] = tuple(ext for ext in suffixes if ext.count(".") > 1)
+        patterns = [item if any(char in item for char in "*?[") else f"*{item}" for item in _split(excludes)]
+        self._excludes: Optional[Pattern] = re.compile(
+            "|".join(fnmatch.translate(pattern) for pattern in patterns)) if patterns else None
+        # 规则指纹，规则变化时扫描清单需重新列出目录
+        self.fingerprint = hashlib.md5(repr((sorted(suffixes), sorted(patterns))).encode()).hexdigest()[:8]
+
+    def is_excluded(self, name: str) -> bool:
+        """
+        文件或目录名是否被排除
+        """
+        return bool(self._excludes and self._excludes.match(name))
+
+    def match(self, name: str) -> bool:
+        """
+        文件名是否符合文件格式且未被排除
+        """
+        lower = name.lower()
+        if os.path.splitext(lower)[1] not in self._extensions \
+                and not (self._multi_extensions and lower.endswith(self._multi_extensions)):
+            return False
+        return not self.is_excluded(name)
@@ -0,0 +1,228 @@
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from .filters import FileFilter
+
+
+class ScanManifest:
+    """
+    监控目录扫描清单
+    记录已处理文件的大小和修改时间、目录的修改时间，再次扫描时只返回新增或变化的文件，
+    修改时间未变化的目录不再列出其中的文件，只检查已记录的子目录
+    """
+
+    # 每累计多少条记录写入一次数据库
+    _flush_size = 1000
+
+    def __init__(self, db_path: Path):
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._lock = threading.Lock()
+        # 待写入的文件记录 (root, path, dir, size, mtime_ns)
+        self._done_files: List[Tuple[str, str, str, int, int]] = []
+        # 本次扫描的目录 (root, path) -> (parent, mtime_ns)
+        self._scanned_dirs: Dict[Tuple[str, str], Tuple[str, Optional[int]]] = {}
+        # 存在处理失败文件的目录
+        self._failed_dirs: Set[Tuple[str, str]] = set()
+        # 目录下已返回但尚未处理完成的文件数
+        self._pending: Dict[Tuple[str, str], int] = {}
+        with self._lock:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS files (
+                    root TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    dir TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    PRIMARY KEY (root, path)
+                );
+                CREATE INDEX IF NOT EXISTS idx_files_dir ON files (root, dir);
+                CREATE TABLE IF NOT EXISTS dirs (
+                    root TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    parent TEXT NOT NULL,
+                    mtime_ns INTEGER,
+                    PRIMARY KEY (root, path)
+                );
+                CREATE INDEX IF NOT EXISTS idx_dirs_parent ON dirs (root, parent);
+            """)
+            self._conn.commit()
+
+    def close(self):
+        """
+        写入未保存的记录并关闭数据库
+        """
+        self.commit()
+        with self._lock:
+            self._conn.close()
+
+    def scan(self, root: str, directory: str, file_filter: FileFilter,
+             full: bool = False) -> Iterator[Tuple[str, int, int]]:
+        """
+        扫描监控目录，边遍历边返回新增或变化的文件 (路径, 大小, 修改时间)
+        :param root: 清单标识，区分不同的源目录和目的目录
+        :param directory: 监控目录
+        :param file_filter: 文件过滤规则，被排除的目录不再进入
+        :param full: 全量扫描，列出所有目录并返回所有文件
+        """
+        stack = [(directory, "")]
+        while stack:
+            path, parent = stack.pop()
+            try:
+                dir_mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                # 目录已不存在
+                self.__remove_dir(root, path)
+                continue
+            if not full and self.__get_dir_mtime(root, path) == dir_mtime:
+                # 目录未变化，只检查已记录的子目录
+                stack.extend((subdir, path) for subdir in self.__get_subdirs(root, path))
+                continue
+            known_files = self.__get_files(root, path)
+            known_subdirs = set(self.__get_subdirs(root, path))
+            subdirs = []
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not file_filter.is_excluded(entry.name):
+                                subdirs.append(entry.path)
+                            continue
+                        if not file_filter.match(entry.name) or not entry.is_file():
+                            continue
+                        stat = entry.stat()
+                        known = known_files.pop(entry.path, None)
+                        if full or known != (stat.st_size, stat.st_mtime_ns):
+                            with self._lock:
+                                self._pending[(root, path)] = self._pending.get((root, path), 0) + 1
+                            yield entry.path, stat.st_size, stat.st_mtime_ns
+            except OSError:
+                continue
+            # 清理已删除的文件和子目录
+            self.__remove_files(root, list(known_files))
+            for subdir in known_subdirs.difference(subdirs):
+                self.__remove_dir(root, subdir)
+            with self._lock:
+                self._scanned_dirs[(root, path)] = (parent, dir_mtime)
+                # 子目录先记录为未扫描，扫描中断或列出失败时下次仍会列出，扫描完成后覆盖为实际修改时间
+                for subdir in subdirs:
+                    self._scanned_dirs[(root, subdir)] = (path, None)
+            stack.extend((subdir, path) for subdir in subdirs)
+
+    def retain(self, prefix: str, root: str):
+        """
+        删除同一源和目的目录下其他清单标识的记录，过滤规则变化后旧规则的记录不再使用
+        :param prefix: 源和目的目录，清单标识为 prefix 或 prefix#规则指纹
+        :param root: 保留的清单标识
+        """
+        with self._lock:
+            for table in ("files", "dirs"):
+                self._conn.execute(f"DELETE FROM {table} WHERE root != ? AND (root = ? OR substr(root, 1, ?) = ?)",
+                                   (root, prefix, len(prefix) + 1, f"{prefix}#"))
+            self._conn.commit()
+
+    def mark_done(self, root: str, path: str, size: int, mtime_ns: int):
+        """
+        记录已处理的文件
+        """
+        with self._lock:
+            self.__release(root, path)
+            self._done_files.append((root, path, os.path.dirname(path), size, mtime_ns))
+            flush = len(self._done_files) >= self._flush_size
+        if flush:
+            self.__flush_files()
+
+    def mark_failed(self, root: str, path: str):
+        """
+        记录处理失败的文件，其所在目录下次扫描时重新列出
+        """
+        with self._lock:
+            self.__release(root, path)
+            self._failed_dirs.add((root, os.path.dirname(path)))
+
+    def __release(self, root: str, path: str):
+        """
+        文件处理完成，减少所在目录的未完成数
+        """
+        key = (root, os.path.dirname(path))
+        if self._pending.get(key, 0) > 1:
+            self._pending[key] -= 1
+        else:
+            self._pending.pop(key, None)
+
+    def commit(self):
+        """
+        写入本次扫描的文件和目录记录，存在失败或未处理文件的目录不记录修改时间，下次扫描时重新列出
+        """
+        self.__flush_files()
+        with self._lock:
+            rows = [(root, path, parent,
+                     None if (root, path) in self._failed_dirs or (root, path) in self._pending else mtime_ns)
+                    for (root, path), (parent, mtime_ns) in self._scanned_dirs.items()]
+            self._scanned_dirs = {}
+            self._failed_dirs = set()
+            self._pending = {}
+            self._conn.executemany("INSERT OR REPLACE INTO dirs (root, path, parent, mtime_ns) "
+                                   "VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def __flush_files(self):
+        """
+        写入已处理的文件记录
+        """
+        with self._lock:
+            rows, self._done_files = self._done_files, []
+            if rows:
+                self._conn.executemany("INSERT OR REPLACE INTO files (root, path, dir, size, mtime_ns) "
+                                       "VALUES (?, ?, ?, ?, ?)", rows)
+                self._conn.commit()
+
+    def __get_dir_mtime(self, root: str, path: str) -> Optional[int]:
+        """
+        目录记录的修改时间
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT mtime_ns FROM dirs WHERE root = ? AND path = ?",
+                                     (root, path)).fetchone()
+        return row[0] if row else None
+
+    def __get_subdirs(self, root: str, path: str) -> List[str]:
+        """
+        目录记录的子目录
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT path FROM dirs WHERE root = ? AND parent = ?",
+                                      (root, path)).fetchall()
+        return [row[0] for row in rows]
+
+    def __get_files(self, root: str, path: str) -> Dict[str, Tuple[int, int]]:
+        """
+        目录记录的文件
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT path, size, mtime_ns FROM files WHERE root = ? AND dir = ?",
+                                      (root, path)).fetchall()
+        return {row[0]: (row[1], row[2]) for row in rows}
+
+    def __remove_files(self, root: str, paths: List[str]):
+        """
+        删除文件记录
+        """
+        if not paths:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM files WHERE root = ? AND path = ?",
+                                   [(root, path) for path in paths])
+
+    def __remove_dir(self, root: str, path: str):
+        """
+        删除目录及其下所有记录
+        """
+        prefix = path.rstrip(os.sep) + os.sep
+        with self._lock:
+            self._conn.execute("DELETE FROM dirs WHERE root = ? AND (path = ? OR substr(path, 1, ?) = ?)",
+                               (root, path, len(prefix), prefix))
+            self._conn.execute("DELETE FROM files WHERE root = ? AND substr(path, 1, ?) = ?",
+                               (root, len(prefix), prefix))
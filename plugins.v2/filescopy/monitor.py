@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, Tuple
+
+from watchdog.events import FileSystemEventHandler
+
+
+class FileMonitorHandler(FileSystemEventHandler):
+    """
+    目录监控响应，文件创建、修改、移入时交给回调处理
+    """
+
+    def __init__(self, mon_path: str, callback: Callable[[str, str], None], **kwargs):
+        super(FileMonitorHandler, self).__init__(**kwargs)
+        self._mon_path = mon_path
+        self._callback = callback
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._callback(self._mon_path, event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._callback(self._mon_path, event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self._callback(self._mon_path, event.dest_path)
+
+
+class StableFileQueue:
+    """
+    文件事件去抖队列
+    文件在去抖时间内没有新事件，且连续多次检查大小不变后，才交给处理函数
+    """
+
+    def __init__(self, handler: Callable[[str, str], None], debounce: float = 3,
+                 stable_checks: int = 2, interval: float = 1):
+        self._handler = handler
+        # 去抖时间（秒）
+        self._debounce = debounce
+        # 大小连续不变的检查次数
+        self._stable_checks = stable_checks
+        # 检查间隔（秒）
+        self._interval = interval
+        # 文件 -> [监控目录, 最后事件时间, 最后检查大小, 大小不变次数]
+        self._files: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add(self, mon_path: str, path: str):
+        """
+        加入或刷新待处理文件
+        """
+        with self._lock:
+            item = self._files.get(path)
+            if item:
+                item[1] = time.monotonic()
+                item[3] = 0
+            else:
+                self._files[path] = [mon_path, time.monotonic(), -1, 0]
+
+    def start(self):
+        """
+        启动检查线程
+        """
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.__run, name="FilesCopyMonitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        停止检查线程，丢弃未处理的文件，由定时全量复制补充处理
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self._interval * 2)
+            self._thread = None
+        with self._lock:
+            self._files = {}
+
+    def __run(self):
+        while not self._stop_event.wait(self._interval):
+            for mon_path, path in self.__stable_files():
+                if self._stop_event.is_set():
+                    break
+                self._handler(mon_path, path)
+
+    def __stable_files(self) -> Tuple[Tuple[str, str], ...]:
+        """
+        取出已稳定的文件
+        """
+        now = time.monotonic()
+        stable = []
+        with self._lock:
+            for path, item in list(self._files.items()):
+                mon_path, last_event, last_size, stable_count = item
+                if now - last_event < self._debounce:
+                    continue
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    # 文件已被删除或移走
+                    self._files.pop(path, None)
+                    continue
+                if size == last_size:
+                    item[3] = stable_count + 1
+                else:
+                    item[2] = size
+                    item[3] = 0
+                if item[3] >= self._stable_checks:
+                    self._files.pop(path, None)
+                    stable.append((mon_path, path))
+        return tuple(stable)
@@ -0,0 +1,193 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from .copier import LINK_METHODS, METHOD_NAMES
+
+# 复制结果
+COPIED = "copied"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+STATUS_NAMES = {
+    COPIED: "复制",
+    SKIPPED: "跳过",
+    FAILED: "失败"
+}
+
+
+@dataclass(frozen=True)
+class DestinationRule:
+    """
+    目的目录的并发和限速设置
+    """
+    # 同时复制的文件数，0为使用默认线程数
+    concurrency: int = 0
+    # 带宽（字节/秒），0为不限制
+    bandwidth: float = 0
+    # 每秒开始复制的文件数，0为不限制
+    file_rate: float = 0
+
+
+class TokenBucket:
+    """
+    令牌桶，允许透支，透支的部分按速率计算等待时间，多个线程共用时按请求先后排队
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        self._rate = rate
+        # 桶容量，允许的突发量
+        self._burst = burst or rate
+        self._tokens = self._burst
+        self._time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """
+        预占令牌，返回需要等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._burst, self._tokens + (now - self._time) * self._rate)
+            self._time = now
+            self._tokens -= amount
+            return -self._tokens / self._rate if self._tokens < 0 else 0
+
+
+class _Destination:
+    """
+    单个限制目录的并发位置和令牌桶
+    """
+
+    def __init__(self, concurrency: int, rule: DestinationRule):
+        self.semaphore = threading.BoundedSemaphore(concurrency)
+        self.bytes_bucket = TokenBucket(rule.bandwidth) if rule.bandwidth > 0 else None
+        self.files_bucket = TokenBucket(rule.file_rate) if rule.file_rate > 0 else None
+
+
+class DestinationLimiter:
+    """
+    按目的目录限制同时复制的文件数、带宽和每秒文件数，同一挂载点下的多个目的目录和所有复制线程共用一个限制
+    """
+
+    def __init__(self, default: int, rules: Dict[str, DestinationRule] = None, event: threading.Event = None):
+        # 未单独配置的目的目录的并发数
+        self._default = max(default, 1)
+        # 按路径长度倒序，优先匹配最长的目录
+        self._rules: List[Tuple[str, DestinationRule]] = sorted(
+            ((os.path.normpath(path), rule) for path, rule in (rules or {}).items()),
+            key=lambda item: len(item[0]), reverse=True)
+        # 退出事件，等待限速时可被打断
+        self._event = event or threading.Event()
+        self._destinations: Dict[str, _Destination] = {}
+        self._lock = threading.Lock()
+
+    def match(self, target: Union[str, Path]) -> Tuple[str, DestinationRule]:
+        """
+        目的目录对应的限制目录和设置
+        """
+        target = os.path.normpath(str(target))
+        for path, rule in self._rules:
+            if target == path or target.startswith(path.rstrip(os.sep) + os.sep):
+                return path, rule
+        return target, DestinationRule()
+
+    def concurrency(self, target: Union[str, Path]) -> int:
+        """
+        目的目录同时复制的文件数
+        """
+        _, rule = self.match(target)
+        return rule.concurrency or self._default
+
+    @contextmanager
+    def slot(self, target: Union[str, Path]):
+        """
+        占用目的目录的一个并发位置，并按每秒文件数限速
+        """
+        destination = self.__get(target)
+        with destination.semaphore:
+            if destination.files_bucket:
+                self.__wait(destination.files_bucket.reserve(1))
+            yield
+
+    def throttle(self, target: Union[str, Path]) -> Optional[Callable[[int], None]]:
+        """
+        目的目录的带宽限速函数，未限制带宽时返回None
+        """
+        bucket = self.__get(target).bytes_bucket
+        if not bucket:
+            return None
+        return lambda size: self.__wait(bucket.reserve(size))
+
+    def __get(self, target: Union[str, Path]) -> _Destination:
+        key, rule = self.match(target)
+        with self._lock:
+            destination = self._destinations.get(key)
+            if not destination:
+                destination = self._destinations[key] = _Destination(rule.concurrency or self._default, rule)
+        return destination
+
+    def __wait(self, seconds: float):
+        """
+        等待限速，服务停止时中断复制
+        """
+        if seconds > 0 and self._event.wait(seconds):
+            raise InterruptedError("文件复制服务停止")
+
+
+class CopyStats:
+    """
+    汇总多个复制线程的处理结果
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        # 结果 -> 文件数
+        self.counts: Dict[str, int] = {}
+        # 结果 -> 字节数
+        self.sizes: Dict[str, int] = {}
+        # 复制方式 -> 文件数
+        self.methods: Dict[str, int] = {}
+        # 硬链接和写时复制节省的字节数
+        self.saved = 0
+
+    def add(self, status: str, size: int = 0, method: Optional[str] = None):
+        """
+        记录单个文件的处理结果
+        :param method: 复制成功时使用的复制方式
+        """
+        with self._lock:
+            self.counts[status] = self.counts.get(status, 0) + 1
+            self.sizes[status] = self.sizes.get(status, 0) + size
+            if method:
+                self.methods[method] = self.methods.get(method, 0) + 1
+                if method in LINK_METHODS:
+                    self.saved += size
+
+    def summary(self) -> str:
+        """
+        处理结果摘要
+        """
+        with self._lock:
+            counts = dict(self.counts)
+            methods = dict(self.methods)
+            sizes = dict(self.sizes)
+            saved = self.saved
+        items = [f"{name} {counts.get(status, 0)} 个" for status, name in STATUS_NAMES.items()]
+        elapsed = time.perf_counter() - self._start
+        summary = f"{'，'.join(items)}，耗时 {elapsed:.1f} 秒"
+        if counts.get(COPIED) and elapsed > 0:
+            # 硬链接和写时复制不传输数据，不计入速率
+            summary += f"，平均速率 {(sizes.get(COPIED, 0) - saved) / elapsed / 1024 / 1024:.2f} MB/s，" \
+                       f"{counts[COPIED] / elapsed:.2f} 个/秒"
+        if methods:
+            summary += "，复制方式：" + "，".join(f"{METHOD_NAMES.get(method, method)} {count} 个"
+                                              for method, count in methods.items())
+        if saved:
+            summary += f"，硬链接和写时复制节省空间 {saved / 1024 / 1024 / 1024:.2f} GB"
+        return summary
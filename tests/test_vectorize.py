@@ -0,0 +1,108 @@
+"""
+自动删种向量化检查与逐个检查的一致性测试
+"""
+import importlib
+import random
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+
+PLUGIN_PATH = Path(__file__).resolve().parents[1] / "plugins.v2" / "autodeletetorrent"
+
+
+def load_module(name: str):
+    """
+    加载插件中不依赖MoviePilot的模块，不执行插件的__init__.py
+    """
+    if "autodeletetorrent" not in sys.modules:
+        package = types.ModuleType("autodeletetorrent")
+        package.__path__ = [str(PLUGIN_PATH)]
+        sys.modules["autodeletetorrent"] = package
+    return importlib.import_module(f"autodeletetorrent.{name}")
+
+
+records = load_module("records")
+rules = load_module("rules")
+vectorize = load_module("vectorize")
+
+GB = rules.GB
+NOW = 1_700_000_000
+QB_STATES = ["pausedUP", "stalledUP", "uploading", "downloading", "error"]
+CATEGORIES = ["movie", "tv", ""]
+SAVE_PATHS = ["/downloads/movies/", "/downloads/tv/", "/data/other/"]
+TRACKERS = ["https://tracker.site1.org/announce", "https://pt.site2.org/announce", "udp://open.site3.net:80"]
+ERRORS = ["", "torrent not registered with this tracker", "unregistered torrent", "timeout"]
+
+
+def make_torrents(count: int = 400, seed: int = 1):
+    """
+    生成QB、TR混合的种子记录，包含未完成（完成时间为0）、TR分享率-1、无Tracker、刚添加等边界情况
+    """
+    rnd = random.Random(seed)
+    torrents = []
+    for index in range(count):
+        size = rnd.choice([0, GB // 2, GB, 5 * GB, rnd.randint(1, 60 * GB)])
+        added_on = NOW - rnd.choice([0, 60, 3600, 86400, rnd.randint(1, 200 * 86400)])
+        completion_on = rnd.choice([0, added_on, added_on + rnd.randint(1, 3600)])
+        ratio = rnd.choice([-1, 0, 0.5, 1, 2, rnd.random() * 5])
+        trackers = tuple(rnd.sample(TRACKERS, rnd.randint(0, 2)))
+        common = dict(hash=f"{index:040x}", name=f"t{index}", size=size, ratio=ratio,
+                      uploaded=max(ratio, 0) * size, added_on=added_on, completion_on=completion_on,
+                      save_path=rnd.choice(SAVE_PATHS))
+        if index % 2:
+            # QB：有状态和分类，无错误信息，只有一个Tracker
+            torrents.append(records.TorrentRecord(**common, trackers=(trackers[0] if trackers else "",),
+                                                  state=rnd.choice(QB_STATES), category=rnd.choice(CATEGORIES)))
+        else:
+            # TR：无状态和分类，有错误信息，可能没有Tracker
+            torrents.append(records.TorrentRecord(**common, trackers=trackers, site="",
+                                                  error=rnd.choice(ERRORS)))
+    return torrents
+
+
+RULE_CONFIGS = {
+    "empty": {},
+    "ratio": {"ratio": "0"},
+    "size": {"size": "1-10"},
+    "single_size": {"size": "5"},
+    "seeding": {"time": "1", "upspeed": "50"},
+    "time_only": {"time": "0"},
+    "upspeed_only": {"upspeed": "100"},
+    "patterns": {"pathkeywords": "movie|tv", "trackerkeywords": r"site(1|3)\."},
+    "mixed": {"ratio": "0.5", "time": "2", "errorkeywords": "registered",
+              "torrentstates": "pausedUP, stalledUP, error", "torrentcategorys": "movie, tv"},
+    "all": {"size": "0-100", "ratio": "-2", "time": "0", "upspeed": "1000000", "pathkeywords": "/",
+            "trackerkeywords": ".", "errorkeywords": ".*", "torrentstates": "pausedUP, stalledUP",
+            "torrentcategorys": "movie"},
+}
+
+
+@pytest.mark.parametrize("name", list(RULE_CONFIGS))
+def test_vectorized_matches_scalar(name):
+    torrent_rules = rules.TorrentRules.from_config(RULE_CONFIGS[name])
+    torrents = make_torrents()
+    expected = [torrent_rules.match(torrent, NOW) for torrent in torrents]
+    assert vectorize.match_torrents(rules=torrent_rules, torrents=torrents, now=NOW) == expected
+
+
+def test_empty_torrents():
+    assert vectorize.match_torrents(rules=rules.TorrentRules.from_config({}), torrents=[], now=NOW) == []
+
+
+def test_from_tr_records():
+    """
+    TR原始对象转换后的记录（分享率-1、无完成时间、无Tracker）
+    """
+    torrents = [records.from_tr(types.SimpleNamespace(
+        hashString=f"{index:040x}", name=f"t{index}", total_size=GB * index, ratio=ratio,
+        date_added=None, date_done=None, download_dir="/downloads/tv/",
+        trackers=[{"announce": TRACKERS[0], "sitename": "site1"}] if index % 2 else [],
+        error_string="", labels=[])) for index, ratio in enumerate([-1, 0, 1.5, 3])]
+    for config in RULE_CONFIGS.values():
+        torrent_rules = rules.TorrentRules.from_config(config)
+        assert vectorize.match_torrents(rules=torrent_rules, torrents=torrents, now=NOW) \
+            == [torrent_rules.match(torrent, NOW) for torrent in torrents]